@@ -0,0 +1,103 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def get_relations_query(querysets):
+    """Один запрос с числом записей и последним id каждой выборки"""
+    rows = [
+        queryset.order_by().annotate(
+            relation=Value(number, output_field=IntegerField())
+        ).values('relation').annotate(
+            total=Count('pk'), last=Max('pk')
+        ).values_list('relation', 'total', 'last')
+        for number, queryset in enumerate(querysets)
+    ]
+    if not rows:
+        return None
+    return rows[0].union(*rows[1:], all=True)
+
+
+def get_relations_state(querysets):
+    """Число записей и последний id каждой выборки связей пользователя.
+
+    Связи только добавляются и удаляются, поэтому пара меняется
+    при любом их изменении.
+    """
+    query = get_relations_query(querysets)
+    return [] if query is None else sorted(query)
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы списка и объекта.
+
+    ETag собирается из последнего изменения и количества объектов
+    выборки, состояния связей пользователя и адреса запроса, поэтому
+    304 отдается без сериализации.
+    """
+
+    updated_fields = ('updated_at',)
+
+    def get_etag_queryset(self):
+        return self.get_queryset()
+
+    def get_overlay_querysets(self, user):
+        """Связи пользователя, от которых зависит представление"""
+        return ()
+
+    def get_etag_extra(self):
+        return ()
+
+    def get_validators(self, request, queryset):
+        """ETag и время последнего изменения выборки.
+
+        Возвращает None, если объект не найден.
+        """
+        aggregates = {
+            field: Max(field) for field in self.updated_fields
+        }
+        state = queryset.order_by().aggregate(total=Count('pk'),
+                                              **aggregates)
+        if self.detail and not state['total']:
+            return None
+        user = request.user
+        overlay = (() if user.is_anonymous
+                   else get_relations_state(self.get_overlay_querysets(user)))
+        source = repr((
+            sorted(state.items(), key=str), overlay,
+            tuple(self.get_etag_extra()), request.get_full_path(),
+            request.accepted_renderer.format,
+        ))
+        updated = [state[field] for field in self.updated_fields
+                   if state[field] is not None]
+        return (quote_etag(hashlib.md5(source.encode()).hexdigest()),
+                max(updated) if updated else None)
+
+    def conditional_response(self, request, view, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_etag_queryset())
+        if self.detail:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(
+                    **{self.lookup_field: kwargs[lookup_url_kwarg]}
+                )
+            except (ValueError, ValidationError):
+                return view(request, *args, **kwargs)
+        validators = self.get_validators(request, queryset)
+        if validators is None:
+            return view(request, *args, **kwargs)
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    last_modified.timestamp()
+                )
+        patch_vary_headers(response, ('Authorization',))
+        return response
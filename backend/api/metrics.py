@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from recipes.cache import get_cache_stats
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = (
+    ('foodgram_request_duration_seconds', 'Время обработки запроса',
+     SECONDS_BUCKETS),
+    ('foodgram_db_duration_seconds', 'Время запросов к базе за запрос',
+     SECONDS_BUCKETS),
+    ('foodgram_serializer_duration_seconds', 'Время сериализации за запрос',
+     SECONDS_BUCKETS),
+    ('foodgram_db_queries', 'Число запросов к базе за запрос',
+     QUERIES_BUCKETS),
+)
+COUNTERS = (
+    ('foodgram_requests_total', 'Число запросов'),
+    ('foodgram_slow_requests_total', 'Число медленных запросов'),
+    ('foodgram_repeated_queries_total',
+     'Число запросов с повторяющимися SQL (N+1)'),
+)
+
+
+class Histogram:
+    """Гистограмма с накопленными корзинами в формате Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield '_bucket', (('le', str(bound)),), total
+        yield '_sum', (), self.sum
+        yield '_count', (), total
+
+
+class Registry:
+    """Метрики запросов процесса.
+
+    Каждый процесс gunicorn считает свои запросы, поэтому Prometheus
+    должен опрашивать процессы по отдельности или суммировать ряды.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name, *_ in HISTOGRAMS}
+        self.counters = {name: {} for name, _ in COUNTERS}
+
+    def observe(self, name, labels, value):
+        buckets = next(buckets for histogram, _, buckets in HISTOGRAMS
+                       if histogram == name)
+        with self.lock:
+            series = self.histograms[name]
+            if labels not in series:
+                series[labels] = Histogram(buckets)
+            series[labels].observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            series = self.counters[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, description, _ in HISTOGRAMS:
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} histogram']
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    for suffix, extra, value in histogram.samples():
+                        lines.append(format_sample(
+                            f'{name}{suffix}', (*labels, *extra), value
+                        ))
+            for name, description in COUNTERS:
+                lines += [f'# HELP {name} {description}',
+                          f'# TYPE {name} counter']
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(format_sample(name, labels, value))
+        for name, value in get_cache_stats().items():
+            lines += [f'# TYPE foodgram_recipes_cache_{name}_total counter',
+                      f'foodgram_recipes_cache_{name}_total {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join(
+            f'{label}="{escape(label_value)}"'
+            for label, label_value in labels
+        ) + '}'
+    return f'{name} {value}'
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,157 @@
+import logging
+import re
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+SLOW_QUERIES_SHOWN = 5
+
+
+def get_fingerprint(sql):
+    """SQL без значений: списки IN и числа заменяются заглушками"""
+    sql = IN_LIST.sub('(...)', sql)
+    sql = NUMBER.sub('?', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+class Recorder:
+    """Запросы к базе и время сериализации одного запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.serializer_time = 0
+        self.serializer_depth = 0
+        self.fingerprints = Counter()
+        self.fingerprint_time = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            fingerprint = get_fingerprint(sql)
+            self.queries += 1
+            self.db_time += elapsed
+            self.fingerprints[fingerprint] += 1
+            self.fingerprint_time[fingerprint] += elapsed
+
+
+def timed_serializer_data(data):
+    """Обертка BaseSerializer.data, учитывающая только внешний вызов"""
+
+    def wrapper(self):
+        recorder = current_recorder.get()
+        if recorder is None or recorder.serializer_depth:
+            return data(self)
+        recorder.serializer_depth += 1
+        started = perf_counter()
+        try:
+            return data(self)
+        finally:
+            recorder.serializer_time += perf_counter() - started
+            recorder.serializer_depth -= 1
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+class InstrumentationMiddleware:
+    """Замеряет запросы к базе, сериализацию и время ответа.
+
+    Пишет заголовок Server-Timing, метрики для /metrics, предупреждения
+    о медленных запросах и повторяющихся SQL (N+1).
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(BaseSerializer.data.fget, 'instrumented', False):
+            BaseSerializer.data = property(
+                timed_serializer_data(BaseSerializer.data.fget)
+            )
+
+    def __call__(self, request):
+        recorder = Recorder()
+        token = current_recorder.set(recorder)
+        started = perf_counter()
+        try:
+            with self.wrap_connections(recorder):
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total = perf_counter() - started
+        self.record(request, response, recorder, total)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.db_time * 1000:.1f};'
+                f'desc="{recorder.queries} queries", '
+                f'serializer;dur={recorder.serializer_time * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        return response
+
+    @staticmethod
+    def wrap_connections(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def record(self, request, response, recorder, total):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        labels = (('view', view), ('method', request.method))
+        registry.inc('foodgram_requests_total',
+                     (*labels, ('status', str(response.status_code))))
+        registry.observe('foodgram_request_duration_seconds', labels, total)
+        registry.observe('foodgram_db_duration_seconds', labels,
+                         recorder.db_time)
+        registry.observe('foodgram_serializer_duration_seconds', labels,
+                         recorder.serializer_time)
+        registry.observe('foodgram_db_queries', labels, recorder.queries)
+        repeated = [
+            (fingerprint, count)
+            for fingerprint, count in recorder.fingerprints.most_common()
+            if count >= settings.INSTRUMENTATION_REPEATED_QUERIES
+        ]
+        if repeated:
+            registry.inc('foodgram_repeated_queries_total', labels)
+            for fingerprint, count in repeated:
+                logger.warning('Повторяющийся запрос (N+1) в %s %s: '
+                               '%s раз: %s', request.method,
+                               request.path, count, fingerprint)
+        if total * 1000 >= settings.INSTRUMENTATION_SLOW_REQUEST_MS:
+            registry.inc('foodgram_slow_requests_total', labels)
+            slowest = sorted(recorder.fingerprint_time.items(),
+                             key=lambda item: item[1], reverse=True)
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, база %.0f мс, '
+                '%s запросов, сериализация %.0f мс\n%s',
+                request.method, request.path, view, total * 1000,
+                recorder.db_time * 1000, recorder.queries,
+                recorder.serializer_time * 1000,
+                '\n'.join(
+                    f'{elapsed * 1000:.1f} мс, '
+                    f'{recorder.fingerprints[fingerprint]} раз: '
+                    f'{fingerprint}'
+                    for fingerprint, elapsed in slowest[:SLOW_QUERIES_SHOWN]
+                ),
+            )
@@ -1,7 +1,40 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from core.constants import PAGE_SIZE
+
+
+class FoodCursorPagination(CursorPagination):
+    """Пагинатор по курсору"""
+
+    ordering = '-id'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
 
 
 class FoodPagination(PageNumberPagination):
-    """Пагинатор страниц"""
+    """Пагинатор страниц.
+
+    Если в запросе передан параметр cursor, переключает кверисеты на
+    пагинацию по первичному ключу без подсчета общего количества.
+    Кверисеты со своей сортировкой, например по релевантности поиска,
+    и готовые списки всегда делятся на страницы по номеру.
+    """
 
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param in request.query_params
+                and hasattr(queryset, 'order_by')
+                and not queryset.query.order_by):
+            self.cursor_paginator = FoodCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -12,7 +12,6 @@ MAX_AMOUNT_INGR = 3000
 NOT_AMOUNT_MESSAGE = 'Количество ингридиентов меньше 1'
 NOT_REPEAT_MESSAGE = 'Ингридиенты не должны повторяться!'
 MIN_AMOUNT_MESSAGE = 'Количество ингредиентов должно быть больше 0!'
-UNIQUE_TAG_MESSAGE = 'Тег должнен быть уникальным!'
 MIN_TAG_MESSAGE = 'Необходимо указать минимум бы один тег!'
 VALIDATE_NAME_MESSAGE = 'Не может состоять только из цифр или символов'
 ERR_SUB_YOUSELF = 'Нельзя подписаться на себя!'
@@ -23,3 +22,21 @@ SUCCESS_UNSUB = 'Подписка удалена'
 ERR_NOT_FOUND = 'Данные для входа не найдены'
 ERR_ALREADY_RECIPE = 'Рецепт уже добавлен!'
 ERR_DEL_RECIPE = 'Рецепт уже удален!'
+ERR_NOT_SUB = 'Вы не подписаны на этого автора'
+AUTOCOMPLETE_LIMIT = 10
+PAGE_SIZE = 6
+BATCH_MAX_SIZE = 100
+BATCH_ADDED = 'added'
+BATCH_EXISTS = 'exists'
+BATCH_REMOVED = 'removed'
+BATCH_ABSENT = 'absent'
+BATCH_NOT_FOUND = 'not_found'
+BATCH_ERROR = 'error'
+NOT_FOUND_INGR_MESSAGE = 'Ингредиенты не найдены: {ids}'
+NOT_FOUND_TAG_MESSAGE = 'Теги не найдены: {ids}'
+REPEAT_INGR_MESSAGE = 'Ингредиенты повторяются: {ids}'
+REPEAT_TAG_MESSAGE = 'Теги повторяются: {ids}'
+COOK_MAX_INGREDIENTS = 50
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_MAX_LIMIT = 100
+CHANGE_LOG_LENGTH = 1000
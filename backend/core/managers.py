@@ -0,0 +1,100 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
+from django.db.models import sql
+
+
+def can_return_rows(connection):
+    """Поддерживает ли база RETURNING в INSERT и DELETE"""
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.features.can_return_columns_from_insert
+
+
+class InsertIgnoreQuerySet(models.QuerySet):
+    """Кверисет с записью одним запросом без предварительных проверок.
+
+    Пакетные методы не отправляют сигналы сохранения и удаления, поэтому
+    вызывающий код сам обновляет зависящие от строк данные.
+    """
+
+    def insert_ignore(self, **values):
+        """Добавляет строку одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+        Возвращает True, если строка добавлена, и False, если такая
+        строка уже есть.
+        """
+        instance = self.model(**values)
+        query = sql.InsertQuery(self.model, ignore_conflicts=True)
+        query.insert_values(
+            [field for field in self.model._meta.concrete_fields
+             if not field.primary_key],
+            [instance],
+        )
+        inserted = 0
+        with connections[self.db].cursor() as cursor:
+            for statement, params in query.get_compiler(
+                using=self.db
+            ).as_sql():
+                cursor.execute(statement, params)
+                inserted += cursor.rowcount
+        return inserted > 0
+
+    def insert_ignore_many(self, rows, returning):
+        """Добавляет строки одним INSERT ... ON CONFLICT DO NOTHING.
+
+        Возвращает множество значений поля returning у строк, которые
+        действительно вставлены этим запросом.
+        """
+        if not rows:
+            return set()
+        connection = connections[self.db]
+        if not can_return_rows(connection):
+            return {values[returning] for values in rows
+                    if self.insert_ignore(**values)}
+        query = sql.InsertQuery(self.model, ignore_conflicts=True)
+        query.insert_values(
+            [field for field in self.model._meta.concrete_fields
+             if not field.primary_key],
+            [self.model(**values) for values in rows],
+        )
+        column = connection.ops.quote_name(
+            self.model._meta.get_field(returning).column
+        )
+        inserted = set()
+        with connection.cursor() as cursor:
+            for statement, params in query.get_compiler(
+                using=self.db
+            ).as_sql():
+                cursor.execute(f'{statement} RETURNING {column}', params)
+                inserted.update(row[0] for row in cursor.fetchall())
+        return inserted
+
+    def delete_returning(self, returning):
+        """Удаляет строки кверисета одним DELETE без сбора связанных.
+
+        Возвращает множество значений поля returning у удаленных строк.
+        Годится только для моделей, на которые никто не ссылается.
+        """
+        connection = connections[self.db]
+        returns_rows = can_return_rows(connection)
+        queryset = self
+        if not returns_rows:
+            deleted = set(self.select_for_update().values_list(
+                returning, flat=True
+            ))
+            queryset = self.filter(**{f'{returning}__in': deleted})
+        try:
+            statement, params = queryset.query.chain(
+                sql.DeleteQuery
+            ).get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return set()
+        if returns_rows:
+            statement += ' RETURNING ' + connection.ops.quote_name(
+                self.model._meta.get_field(returning).column
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(statement, params)
+            if returns_rows:
+                deleted = {row[0] for row in cursor.fetchall()}
+        return deleted
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,6 +88,46 @@ else:
     }
 AUTH_USER_MODEL = 'users.User'
 
+# Номера версий кэша страниц и каталога хранятся в самом кэше, поэтому
+# при нескольких процессах нужен общий бэкенд (Memcached, Redis):
+# LocMemCache у каждого процесса свой. Журнал изменений ингредиентов
+# для подбора рецептов ведется в базе и от бэкенда кэша не зависит.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPES_CACHE_ALIAS = 'default'
+
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 300))
+
+CATALOGUE_MAX_AGE = int(os.getenv('CATALOGUE_MAX_AGE', 60))
+
+INSTRUMENTATION_ENABLED = (
+    os.getenv('INSTRUMENTATION_ENABLED', 'false').lower() == 'true'
+)
+
+INSTRUMENTATION_SERVER_TIMING = (
+    os.getenv('INSTRUMENTATION_SERVER_TIMING', 'true').lower() == 'true'
+)
+
+INSTRUMENTATION_SLOW_REQUEST_MS = int(
+    os.getenv('INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+)
+
+INSTRUMENTATION_REPEATED_QUERIES = int(
+    os.getenv('INSTRUMENTATION_REPEATED_QUERIES', 5)
+)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -120,6 +161,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_WIDTHS = (320, 640, 960)
+
+RECIPE_IMAGES_ASYNC = os.getenv('RECIPE_IMAGES_ASYNC', 'true').lower() == 'true'
+
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -134,6 +181,15 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 DJOSER = {
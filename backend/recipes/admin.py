@@ -1,12 +1,18 @@
 from django.contrib import admin
 
 from core.constants import MIN_AMOUNT_TIME_OR_INGR
+from .cache import invalidate_recipes_cache
 from .models import (Ingredient,
                      Tag,
                      Recipe,
                      IngredientInRecipe,
                      Favorite,
                      ShoppingCart)
+from .feed import fan_out
+from .matching import log_recipe_changes
+from .search import update_search_documents
+from .shopping_list import track_recipe_amounts
+from .snapshots import update_snapshots
 
 
 class IngredientRecipeInLine(admin.TabularInline):
@@ -27,6 +33,18 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('name',)
     inlines = (IngredientRecipeInLine,)
 
+    def save_related(self, request, form, formsets, change):
+        recipe_ids = set(form.instance.ingr_recipes.values_list(
+            'recipe_id', flat=True
+        ))
+        for formset in formsets:
+            recipe_ids.update(
+                item['recipe'].pk for item in formset.cleaned_data
+                if item.get('recipe')
+            )
+        with track_recipe_amounts(recipe_ids):
+            super().save_related(request, form, formsets, change)
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -41,12 +59,25 @@ class TagAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     """Админка для тега"""
 
-    list_display = ('id', 'name', 'author')
+    list_display = ('id', 'name', 'author', 'is_favorited')
     search_fields = ('author', 'name', 'tags')
+    readonly_fields = ('favorites_count', 'in_carts_count')
     inlines = (IngredientRecipeInLine,)
 
     def is_favorited(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
+
+    is_favorited.short_description = 'В избранном'
+
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_amounts([form.instance.pk] if change else []):
+            super().save_related(request, form, formsets, change)
+        update_search_documents([form.instance.pk])
+        update_snapshots([form.instance.pk])
+        log_recipe_changes([form.instance.pk])
+        if not change:
+            fan_out([form.instance])
+        invalidate_recipes_cache()
 
 
 @admin.register(Favorite)
@@ -0,0 +1,143 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from recipes.cache import get_catalogue_version
+from recipes.models import Ingredient
+
+MIN_TYPO_LENGTH = 3
+MAX_TYPO_LENGTH = 12
+
+
+def common_prefix(first, second):
+    length = 0
+    for first_letter, second_letter in zip(first, second):
+        if first_letter != second_letter:
+            break
+        length += 1
+    return length
+
+
+def deletions(word):
+    """Слово и все его варианты без одной буквы"""
+    return {word} | {word[:index] + word[index + 1:]
+                     for index in range(len(word))}
+
+
+class IngredientIndex:
+    """Индекс ингредиентов для подсказок.
+
+    Хранит отсортированные названия для поиска по префиксу бинарным
+    поиском, склеенную строку названий для поиска по вхождению и
+    варианты префиксов слов без одной буквы для поиска с опечаткой.
+    Перестраивается при смене версии каталога.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.index = self.build([])
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def build(entries):
+        keys = [entry['name'].lower() for entry in entries]
+        offsets = []
+        offset = 0
+        for key in keys:
+            offsets.append(offset)
+            offset += len(key) + 1
+        typos = {}
+        for position, key in enumerate(keys):
+            for word_number, word in enumerate(key.split()):
+                for length in range(MIN_TYPO_LENGTH,
+                                    min(len(word), MAX_TYPO_LENGTH) + 1):
+                    for variant in deletions(word[:length]):
+                        typos.setdefault(variant, {}).setdefault(
+                            position, word_number
+                        )
+        return keys, entries, '\n'.join(keys), offsets, typos
+
+    def refresh(self):
+        version = get_catalogue_version()
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            rows = Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+            self.index = self.build(sorted(
+                ({'id': pk, 'name': name,
+                  'measurement_unit': measurement_unit}
+                 for pk, name, measurement_unit in rows),
+                key=lambda entry: (entry['name'].lower(),
+                                   entry['measurement_unit']),
+            ))
+            self.version = version
+
+    @staticmethod
+    def prefix(keys, query, limit):
+        start = bisect_left(keys, query)
+        end = bisect_right(keys, query + '\uffff', lo=start)
+        return list(range(start, min(end, start + limit)))
+
+    def starting_with(self, query):
+        """Ингредиенты, названия которых начинаются с query"""
+        self.refresh()
+        keys, entries = self.index[:2]
+        return [entries[position] for position in self.prefix(
+            keys, query.lower(), len(keys)
+        ) if entries[position]['name'].startswith(query)]
+
+    @staticmethod
+    def infix(keys, text, offsets, query, found, limit):
+        matches = {}
+        start = text.find(query)
+        while start != -1:
+            position = bisect_right(offsets, start) - 1
+            if position not in found:
+                word_start = text[start - 1] in ' \n'
+                matches.setdefault(position, not word_start)
+            start = text.find(query, start + 1)
+        ranked = sorted(matches, key=lambda position: (
+            matches[position], len(keys[position]), position
+        ))
+        return ranked[:limit]
+
+    @staticmethod
+    def fuzzy(keys, typos, query, found, limit):
+        matches = {}
+        for variant in deletions(query[:MAX_TYPO_LENGTH]):
+            for position, word_number in typos.get(variant, {}).items():
+                if position not in found:
+                    matches[position] = min(
+                        word_number, matches.get(position, word_number)
+                    )
+        ranked = sorted(matches, key=lambda position: (
+            matches[position],
+            -common_prefix(
+                query, keys[position].split()[matches[position]]
+            ),
+            len(keys[position]),
+            position,
+        ))
+        return ranked[:limit]
+
+    def search(self, query, limit=10):
+        """Ингредиенты по префиксу, вхождению и с одной опечаткой"""
+        self.refresh()
+        keys, entries, text, offsets, typos = self.index
+        query = query.strip().lower()
+        if not query:
+            return []
+        found = self.prefix(keys, query, limit)
+        if len(found) < limit:
+            found += self.infix(keys, text, offsets, query,
+                                set(found), limit - len(found))
+        if len(found) < limit and len(query) >= MIN_TYPO_LENGTH:
+            found += self.fuzzy(keys, typos, query,
+                                set(found), limit - len(found))
+        return [entries[position] for position in found]
+
+
+ingredient_index = IngredientIndex()
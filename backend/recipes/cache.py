@@ -0,0 +1,86 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'recipes:version'
+HITS_KEY = 'recipes:hits'
+MISSES_KEY = 'recipes:misses'
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def get_cache():
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def get_version(key=VERSION_KEY):
+    """Текущая версия кэша по ключу"""
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key=VERSION_KEY):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key)
+
+
+def invalidate_recipes_cache():
+    """Сбрасывает кэш рецептов после фиксации транзакции"""
+    transaction.on_commit(bump_version)
+
+
+def get_catalogue_version():
+    return get_version(CATALOGUE_VERSION_KEY)
+
+
+def invalidate_catalogue():
+    """Сбрасывает кэш тегов и ингредиентов после фиксации транзакции"""
+    transaction.on_commit(lambda: bump_version(CATALOGUE_VERSION_KEY))
+
+
+def make_key(request):
+    params = sorted(
+        (key, sorted(request.query_params.getlist(key)))
+        for key in request.query_params
+    )
+    query = urlencode([(key, value)
+                       for key, values in params for value in values])
+    return (f'recipes:page:{get_version()}:'
+            f'{request.get_host()}{request.path}?{query}')
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_cached_page(request):
+    """Возвращает сохраненную страницу или None"""
+    data = get_cache().get(make_key(request))
+    _count(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def set_cached_page(request, data):
+    get_cache().set(make_key(request), data,
+                    timeout=settings.RECIPES_CACHE_TIMEOUT)
+
+
+def get_cache_stats():
+    cache = get_cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
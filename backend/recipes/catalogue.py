@@ -0,0 +1,66 @@
+import hashlib
+import threading
+
+from recipes.cache import get_catalogue_version
+from recipes.models import Ingredient, Tag
+from recipes.serializers import IngredientSerializer, TagSerializer
+
+
+class Catalogue:
+    """Сериализованные теги и ингредиенты в памяти процесса.
+
+    Перечитываются из базы, только когда меняется общая версия
+    каталога, поэтому все процессы видят одни и те же данные.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.data = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def build(version):
+        tags = [dict(tag) for tag in TagSerializer(
+            Tag.objects.all(), many=True
+        ).data]
+        ingredients = [dict(ingredient) for ingredient in IngredientSerializer(
+            Ingredient.objects.all(), many=True
+        ).data]
+        return {
+            'version': version,
+            'tags': tags,
+            'tags_by_id': {tag['id']: tag for tag in tags},
+            'ingredients': ingredients,
+            'ingredients_by_id': {
+                ingredient['id']: ingredient for ingredient in ingredients
+            },
+            'tag_choices': [(tag['slug'], tag['name']) for tag in tags],
+        }
+
+    def refresh(self):
+        """Снимок каталога, актуальный для текущей версии"""
+        version = get_catalogue_version()
+        if version == self.version:
+            return self.data
+        with self.lock:
+            if version != self.version:
+                self.data = self.build(version)
+                self.version = version
+            return self.data
+
+    def get(self, name):
+        return self.refresh()[name]
+
+    @staticmethod
+    def get_etag(request, data):
+        """ETag ответа: версия каталога, адрес и формат запроса"""
+        source = (f'{data["version"]}:{request.get_full_path()}:'
+                  f'{request.accepted_renderer.format}')
+        return hashlib.md5(source.encode()).hexdigest()
+
+
+catalogue = Catalogue()
+
+
+def get_tag_choices():
+    return catalogue.get('tag_choices')
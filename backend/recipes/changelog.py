@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import F
+
+from core.constants import CHANGE_LOG_LENGTH
+from recipes.models import ChangeLog, ChangeLogEntry
+
+
+def get_log_version(key):
+    """Текущий номер журнала изменений"""
+    return ChangeLog.objects.filter(key=key).values_list(
+        'version', flat=True
+    ).first() or 0
+
+
+def log_changes(key, ids):
+    """Записывает id в журнал изменений в текущей транзакции.
+
+    Номер берется через UPDATE строки журнала, блокировка которой
+    держится до фиксации транзакции. Поэтому записи фиксируются в
+    порядке номеров, и читатель, увидевший номер, видит все записи
+    до него. Записи старше CHANGE_LOG_LENGTH номеров удаляются.
+    """
+    ids = set(ids)
+    if not ids:
+        return
+    log = ChangeLog.objects.filter(key=key)
+    with transaction.atomic():
+        if not log.update(version=F('version') + 1):
+            ChangeLog.objects.get_or_create(key=key)
+            log.update(version=F('version') + 1)
+        version = get_log_version(key)
+        ChangeLogEntry.objects.bulk_create(
+            ChangeLogEntry(log_id=key, version=version, object_id=pk)
+            for pk in ids
+        )
+        ChangeLogEntry.objects.filter(
+            log_id=key, version__lte=version - CHANGE_LOG_LENGTH
+        ).delete()
+
+
+def get_changes(key, since, limit=CHANGE_LOG_LENGTH):
+    """Номер журнала и id, измененные после номера since.
+
+    Вместо списка возвращает None, если изменений больше limit,
+    и тогда данные нужно перестроить целиком.
+    """
+    current = get_log_version(key)
+    if since is None or not 0 <= current - since <= limit:
+        return current, None
+    return current, list(ChangeLogEntry.objects.filter(
+        log_id=key, version__gt=since, version__lte=current
+    ).values_list('object_id', flat=True))
@@ -0,0 +1,11 @@
+from django.db.models import F, IntegerField
+from django.db.models.functions import Greatest
+
+
+def shift_counter(model, field, pks, delta):
+    """Сдвигает счетчик объектов на delta, не опуская его ниже нуля"""
+    if not pks or not delta:
+        return
+    model.objects.filter(pk__in=pks).update(**{field: Greatest(
+        F(field) + delta, 0, output_field=IntegerField()
+    )})
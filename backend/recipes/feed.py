@@ -0,0 +1,102 @@
+from core.constants import FEED_FANOUT_MAX_FOLLOWERS
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+
+
+def get_followers(author_ids):
+    followers = {}
+    for author_id, user_id in Subscription.objects.filter(
+        author_id__in=author_ids
+    ).values_list('author_id', 'user_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    return followers
+
+
+def fill(followers):
+    """Раскладывает все рецепты авторов по лентам их подписчиков"""
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id)
+            for recipe_id, author_id in Recipe.objects.filter(
+                author_id__in=followers
+            ).values_list('id', 'author_id').iterator()
+            for user_id in followers[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(recipes):
+    """Добавляет новые рецепты в ленты подписчиков их авторов.
+
+    Рецепты авторов с большим числом подписчиков не раскладываются,
+    их лента забирает при чтении.
+    """
+    followers = get_followers(User.objects.filter(
+        pk__in={recipe.author_id for recipe in recipes},
+        followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('pk', flat=True))
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                      author_id=recipe.author_id)
+            for recipe in recipes
+            for user_id in followers.get(recipe.author_id, ())
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author_ids):
+    """Добавляет в ленту рецепты авторов, на которых подписался user"""
+    fill({
+        author_id: [user.pk]
+        for author_id in User.objects.filter(
+            pk__in=author_ids,
+            followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('pk', flat=True)
+    })
+
+
+def remove(user, author_ids):
+    """Убирает из ленты рецепты авторов, от которых user отписался.
+
+    Авторы, у которых подписчиков стало ровно на границе раскладки,
+    перестают читаться напрямую, поэтому их рецепты раскладываются
+    по лентам оставшихся подписчиков.
+    """
+    FeedEntry.objects.filter(user=user, author_id__in=author_ids).delete()
+    crossed = list(User.objects.filter(
+        pk__in=author_ids,
+        followers_count=FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('pk', flat=True))
+    if crossed:
+        fill(get_followers(crossed))
+
+
+def get_feed_ids(user, before, limit):
+    """Id рецептов ленты меньше before, от новых к старым.
+
+    Объединяет разложенные записи ленты с последними рецептами
+    авторов, у которых слишком много подписчиков для раскладки.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    popular = Recipe.objects.filter(
+        author__following__user=user,
+        author__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+    )
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+        popular = popular.filter(id__lt=before)
+    recipe_ids = set(entries.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True
+    )[:limit])
+    recipe_ids.update(popular.order_by('-id').values_list(
+        'id', flat=True
+    )[:limit])
+    return sorted(recipe_ids, reverse=True)[:limit]
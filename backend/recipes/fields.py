@@ -0,0 +1,76 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import (MANY_RELATION_KWARGS,
+                                      ManyRelatedField,
+                                      PrimaryKeyRelatedField)
+
+
+def fetch_by_ids(queryset, ids, not_found_message, repeat_message):
+    """Загружает объекты по списку id одним запросом.
+
+    Отсутствующие и повторяющиеся id собираются в одну ошибку.
+    """
+    objects = queryset.in_bulk(set(ids))
+    seen = set()
+    repeated = []
+    for pk in ids:
+        if pk in seen and pk not in repeated:
+            repeated.append(pk)
+        seen.add(pk)
+    missing = [pk for pk in dict.fromkeys(ids) if pk not in objects]
+    errors = []
+    if missing:
+        errors.append(not_found_message.format(
+            ids=', '.join(map(str, missing))
+        ))
+    if repeated:
+        errors.append(repeat_message.format(
+            ids=', '.join(map(str, repeated))
+        ))
+    if errors:
+        raise ValidationError(errors)
+    return [objects[pk] for pk in ids]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """Список связанных объектов, загружаемый одним запросом"""
+
+    def __init__(self, not_found_message, repeat_message, **kwargs):
+        self.not_found_message = not_found_message
+        self.repeat_message = repeat_message
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = []
+        for item in data:
+            if isinstance(item, bool):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+            try:
+                ids.append(int(item))
+            except (TypeError, ValueError):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+        return fetch_by_ids(self.child_relation.get_queryset(), ids,
+                            self.not_found_message, self.repeat_message)
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Поле по первичному ключу, со списком через BulkManyRelatedField"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {
+            'not_found_message': kwargs.pop('not_found_message'),
+            'repeat_message': kwargs.pop('repeat_message'),
+            'child_relation': cls(*args, **kwargs),
+        }
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -1,30 +1,22 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from .models import Ingredient, Recipe, Tag
-
-
-class IngredientFilter(FilterSet):
-    """Фильтр ингридиентов"""
-
-    name = filters.CharFilter(lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
+from .catalogue import get_tag_choices
+from .models import Recipe
+from .search import search_recipes
 
 
 class RecipeFilter(FilterSet):
     """Фильтр рецептов"""
 
-    tags = filters.ModelMultipleChoiceFilter(
+    tags = filters.MultipleChoiceFilter(
         field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+        choices=get_tag_choices,
     )
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -41,3 +33,6 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
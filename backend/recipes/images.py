@@ -0,0 +1,101 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.cache import invalidate_recipes_cache
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = (
+    ('webp', 'WEBP'),
+    ('jpeg', 'JPEG'),
+)
+VARIANT_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def make_image_variants(name):
+    """Сохраняет уменьшенные копии изображения и возвращает их пути.
+
+    Имена файлов строятся по хэшу содержимого, поэтому одинаковые
+    изображения обрабатываются один раз.
+    """
+    with default_storage.open(name) as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    image = Image.open(io.BytesIO(content)).convert('RGB')
+    variants = {}
+    for width in settings.RECIPE_IMAGE_WIDTHS:
+        if width >= image.width:
+            continue
+        resized = image.resize(
+            (width, round(image.height * width / image.width)),
+            Image.LANCZOS,
+        )
+        for extension, image_format in VARIANT_FORMATS:
+            path = f'recipes/variants/{digest}_{width}.{extension}'
+            if not default_storage.exists(path):
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, quality=VARIANT_QUALITY)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+            variants.setdefault(str(width), {})[extension] = path
+    return variants
+
+
+def process_recipe_image(recipe_id, name):
+    try:
+        variants = make_image_variants(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+        return
+    # Представления рендерятся сериализаторами, которые сами импортируют
+    # этот модуль.
+    from recipes.snapshots import update_snapshots
+
+    with transaction.atomic():
+        if Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants=variants, updated_at=timezone.now()
+        ):
+            update_snapshots([recipe_id])
+            invalidate_recipes_cache()
+
+
+def process_in_background(recipe_id, name):
+    try:
+        process_recipe_image(recipe_id, name)
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe):
+    """Ставит обработку изображения рецепта в очередь после коммита"""
+    recipe_id, name = recipe.pk, recipe.image.name
+
+    def submit():
+        if settings.RECIPE_IMAGES_ASYNC:
+            executor.submit(process_in_background, recipe_id, name)
+        else:
+            process_recipe_image(recipe_id, name)
+
+    transaction.on_commit(submit)
+
+
+def get_image_variant_urls(recipe):
+    return {
+        width: {extension: default_storage.url(path)
+                for extension, path in formats.items()}
+        for width, formats in recipe.image_variants.items()
+    }
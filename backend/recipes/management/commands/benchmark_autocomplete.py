@@ -0,0 +1,45 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient
+
+QUERIES = ('с', 'са', 'сах', 'мол', 'морк', 'карт', 'соус', 'сыр',
+           'мокровь', 'сахр', 'перец', 'масло')
+
+
+def measure(search, queries, repeat):
+    started = perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            search(query)
+    return (perf_counter() - started) * 1000 / (repeat * len(queries))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает подсказки ингредиентов с фильтром по префиксу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        limit = options['limit']
+
+        def prefix_search(query):
+            return list(Ingredient.objects.filter(
+                name__startswith=query
+            )[:limit])
+
+        def index_search(query):
+            return ingredient_index.search(query, limit)
+
+        ingredient_index.refresh()
+        self.stdout.write(f'Ингредиентов: {len(ingredient_index.index[0])}')
+        for name, search in (('name__startswith', prefix_search),
+                             ('IngredientIndex', index_search)):
+            self.stdout.write(
+                f'{name}: {measure(search, QUERIES, repeat):.3f} мс/запрос'
+            )
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.serializers import RecipeWriteSerializer
+from recipes.shopping_list import (diff_amounts,
+                                   get_recipe_amounts,
+                                   update_shopping_lists)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def unchanged(ingredients_data, spare):
+    return ingredients_data
+
+
+def change_amount(ingredients_data, spare):
+    first, *rest = ingredients_data
+    return [{'id': first['id'], 'amount': first['amount'] + 1}, *rest]
+
+
+def add_ingredient(ingredients_data, spare):
+    return [*ingredients_data, {'id': spare, 'amount': 1}]
+
+
+def remove_ingredient(ingredients_data, spare):
+    return ingredients_data[:-1]
+
+
+SCENARIOS = (
+    ('без изменений', unchanged),
+    ('изменено количество', change_amount),
+    ('добавлен ингредиент', add_ingredient),
+    ('удален ингредиент', remove_ingredient),
+)
+
+
+def legacy_update(recipe, ingredients_data):
+    """Прежнее обновление: удаление и повторное создание всех строк.
+
+    Строки списков покупок в подсчет строк не входят.
+    """
+    old_amounts = get_recipe_amounts(recipe)
+    deleted, _ = IngredientInRecipe.objects.filter(recipe=recipe).delete()
+    RecipeWriteSerializer().add_ingredients(recipe, ingredients_data)
+    update_shopping_lists(
+        recipe.shopping_cart.values_list('user_id', flat=True),
+        diff_amounts(old_amounts, get_recipe_amounts(recipe)),
+    )
+    return deleted + len(ingredients_data)
+
+
+def diff_update(recipe, ingredients_data):
+    """Обновление по разнице с имеющимися строками"""
+    serializer = RecipeWriteSerializer()
+    to_create, to_update, to_delete = serializer.diff_ingredients(
+        recipe, IngredientInRecipe.objects.filter(recipe=recipe),
+        ingredients_data,
+    )
+    serializer.update_ingredients(recipe, ingredients_data)
+    return len(to_create) + len(to_update) + len(to_delete)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает число записей в базу при обновлении ингредиентов '
+            'рецепта удалением и по разнице')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipe', type=int,
+                            help='id рецепта, по умолчанию самый крупный')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['recipe']:
+            recipes = recipes.filter(pk=options['recipe'])
+        recipe = max(recipes.prefetch_related('recipe_ingr__ingredient'),
+                     key=lambda recipe: len(recipe.recipe_ingr.all()),
+                     default=None)
+        if recipe is None or not recipe.recipe_ingr.all():
+            raise CommandError('Нет рецепта с ингредиентами')
+        ingredients_data = [{'id': row.ingredient, 'amount': row.amount}
+                            for row in recipe.recipe_ingr.all()]
+        spare = Ingredient.objects.exclude(
+            pk__in=[data['id'].pk for data in ingredients_data]
+        ).first()
+        self.stdout.write(f'Рецепт {recipe.pk}: '
+                          f'{len(ingredients_data)} ингредиентов')
+        for title, scenario in SCENARIOS:
+            if spare is None and scenario is add_ingredient:
+                continue
+            data = scenario(ingredients_data, spare)
+            for name, update in (('удаление', legacy_update),
+                                 ('разница', diff_update)):
+                rows, statements = self.measure(update, recipe, data)
+                self.stdout.write(f'{title}, {name}: строк {rows}, '
+                                  f'запросов на запись {statements}')
+
+    @staticmethod
+    def measure(update, recipe, ingredients_data):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                rows = update(recipe, ingredients_data)
+            transaction.set_rollback(True)
+        statements = sum(
+            query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)
+            for query in context.captured_queries
+        )
+        return rows, statements
@@ -0,0 +1,103 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from core.constants import PAGE_SIZE
+from recipes.management.commands.import_recipes import create_recipes
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.search import search_recipes, update_search_documents
+from users.models import User
+
+BATCH_SIZE = 1000
+INGREDIENTS_PER_RECIPE = 6
+DISHES = ('суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'омлет',
+          'паста', 'плов', 'блины')
+ADJECTIVES = ('домашний', 'быстрый', 'сладкий', 'острый', 'летний',
+              'праздничный', 'постный', 'сытный')
+QUERIES = ('суп', 'сладк', 'пирог яблок', 'картофель', 'острый салат',
+           'запеканка творог', 'несуществующееслово')
+
+
+class Command(BaseCommand):
+    help = ('Создает тестовые рецепты и сравнивает полнотекстовый поиск '
+            'с фильтром icontains; данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        if len(ingredients) < INGREDIENTS_PER_RECIPE:
+            raise CommandError('Сначала загрузите ингредиенты')
+        with transaction.atomic():
+            started = perf_counter()
+            self.generate(options['recipes'], ingredients,
+                          random.Random(options['seed']))
+            self.stdout.write(f'Создано рецептов: {options["recipes"]} '
+                              f'за {perf_counter() - started:.1f} с')
+            for name, search in (('search', self.full_text),
+                                 ('icontains', self.icontains)):
+                self.stdout.write(
+                    f'{name}: {self.measure(search, options["repeat"]):.1f}'
+                    ' мс/запрос'
+                )
+            transaction.set_rollback(True)
+
+    def generate(self, total, ingredients, generator):
+        author, _ = User.objects.get_or_create(
+            email='benchmark@example.com',
+            defaults={'username': 'benchmark', 'first_name': 'benchmark',
+                      'last_name': 'benchmark'},
+        )
+        for start in range(0, total, BATCH_SIZE):
+            size = min(BATCH_SIZE, total - start)
+            chosen = [generator.sample(ingredients, INGREDIENTS_PER_RECIPE)
+                      for _ in range(size)]
+            recipes = create_recipes([
+                Recipe(
+                    author=author,
+                    name=(f'{generator.choice(ADJECTIVES).capitalize()} '
+                          f'{generator.choice(DISHES)} '
+                          f'c {names[0][1]}'),
+                    text=' '.join(name for _, name in names),
+                    cooking_time=generator.randint(5, 120),
+                    image='recipes/benchmark.jpg',
+                )
+                for names in chosen
+            ])
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(recipe_id=recipe.pk,
+                                   ingredient_id=ingredient_id,
+                                   amount=generator.randint(1, 500))
+                for recipe, names in zip(recipes, chosen)
+                for ingredient_id, _ in names
+            ])
+            update_search_documents([recipe.pk for recipe in recipes])
+
+    @staticmethod
+    def full_text(query):
+        return search_recipes(Recipe.objects.all(), query)
+
+    @staticmethod
+    def icontains(query):
+        condition = Q()
+        for word in query.split():
+            condition &= (Q(name__icontains=word) | Q(text__icontains=word)
+                          | Q(ingredients__name__icontains=word))
+        return Recipe.objects.filter(condition).distinct()
+
+    @staticmethod
+    def measure(search, repeat):
+        """Среднее время запроса первой страницы вместе с подсчетом"""
+        started = perf_counter()
+        for _ in range(repeat):
+            for query in QUERIES:
+                queryset = search(query)
+                queryset.count()
+                list(queryset[:PAGE_SIZE])
+        return (perf_counter() - started) * 1000 / (repeat * len(QUERIES))
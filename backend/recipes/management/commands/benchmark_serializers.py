@@ -0,0 +1,139 @@
+import random
+from io import BytesIO
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+
+from api.parsers import FastJSONParser, orjson
+from api.renderers import FastJSONRenderer
+from recipes.management.commands.import_recipes import create_recipes
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.serializers import (IngredienterRecipeReadializer,
+                                 RecipeReadSerializer,
+                                 TagSerializer)
+from users.models import User
+from users.serializers import FoodUserSerializer
+
+INGREDIENTS_PER_RECIPE = 8
+
+
+class GenericTagSerializer(TagSerializer):
+    to_representation = ModelSerializer.to_representation
+
+
+class GenericUserSerializer(FoodUserSerializer):
+    to_representation = ModelSerializer.to_representation
+
+
+class GenericIngredientSerializer(IngredienterRecipeReadializer):
+    to_representation = ModelSerializer.to_representation
+
+
+class GenericRecipeSerializer(RecipeReadSerializer):
+    """Чтение рецепта через поля ModelSerializer, как до оптимизации"""
+
+    tags = GenericTagSerializer(many=True, read_only=True)
+    author = GenericUserSerializer(read_only=True)
+    ingredients = GenericIngredientSerializer(many=True,
+                                              source='recipe_ingr')
+
+    def to_representation(self, instance):
+        instance.author.is_subscribed = instance.is_author_subscribed
+        return ModelSerializer.to_representation(self, instance)
+
+
+class Command(BaseCommand):
+    help = ('Создает тестовые рецепты и сравнивает скорость сериализации '
+            'и рендеринга JSON; данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if len(ingredients) < INGREDIENTS_PER_RECIPE or not tags:
+            raise CommandError('Сначала загрузите теги и ингредиенты')
+        if orjson is None:
+            self.stdout.write('orjson не установлен, сравнивается '
+                              'стандартный json сам с собой')
+        with transaction.atomic():
+            self.generate(options['recipes'], ingredients, tags,
+                          random.Random(options['seed']))
+            recipes = list(Recipe.objects.with_related().with_user_flags(
+                None
+            ).filter(author__email='benchmark@example.com'))
+            self.compare(recipes, options['repeat'])
+            transaction.set_rollback(True)
+
+    def generate(self, total, ingredients, tags, generator):
+        author, _ = User.objects.get_or_create(
+            email='benchmark@example.com',
+            defaults={'username': 'benchmark', 'first_name': 'benchmark',
+                      'last_name': 'benchmark'},
+        )
+        recipes = create_recipes([
+            Recipe(author=author, name=f'Рецепт {number}',
+                   text='Описание рецепта ' * 20,
+                   cooking_time=generator.randint(5, 120),
+                   image='recipes/benchmark.jpg')
+            for number in range(total)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe in recipes
+            for tag_id in generator.sample(tags, min(2, len(tags)))
+        ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe_id=recipe.pk,
+                               ingredient_id=ingredient_id,
+                               amount=generator.randint(1, 500))
+            for recipe in recipes
+            for ingredient_id in generator.sample(
+                ingredients, INGREDIENTS_PER_RECIPE
+            )
+        ])
+
+    def measure(self, name, function, repeat, size):
+        started = perf_counter()
+        for _ in range(repeat):
+            result = function()
+        elapsed = (perf_counter() - started) / repeat
+        self.stdout.write(f'{name}: {elapsed * 1000:.1f} мс, '
+                          f'{size / elapsed:.0f} рецептов/с')
+        return result
+
+    def compare(self, recipes, repeat):
+        size = len(recipes)
+        generic = self.measure(
+            'ModelSerializer',
+            lambda: GenericRecipeSerializer(recipes, many=True).data,
+            repeat, size,
+        )
+        data = self.measure(
+            'RecipeReadSerializer',
+            lambda: RecipeReadSerializer(recipes, many=True).data,
+            repeat, size,
+        )
+        if generic != data:
+            raise CommandError('Представления рецептов различаются')
+        content = self.measure(
+            'JSONRenderer', lambda: JSONRenderer().render(data), repeat, size
+        )
+        fast_content = self.measure(
+            'FastJSONRenderer', lambda: FastJSONRenderer().render(data),
+            repeat, size,
+        )
+        if content != fast_content:
+            raise CommandError('Результаты рендереров различаются')
+        self.stdout.write(f'Размер ответа: {len(content) / 1024:.0f} КБ')
+        for name, parser in (('JSONParser', JSONParser()),
+                             ('FastJSONParser', FastJSONParser())):
+            self.measure(name, lambda: parser.parse(BytesIO(content)),
+                         repeat, size)
@@ -0,0 +1,121 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.conditional import get_relations_query
+from core.constants import PAGE_SIZE
+from recipes.models import IngredientInRecipe, Recipe, Tag
+from recipes.overlay import get_overlay_querysets
+from recipes.shopping_list import get_cart_ingredients
+from recipes.views import RecipeViewSet
+from users.models import User
+
+
+def get_view_queryset(user, params=None, action='list'):
+    """Выборка RecipeViewSet для GET-запроса с параметрами params"""
+    request = APIRequestFactory().get('/', params or {})
+    force_authenticate(request, user=user)
+    view = RecipeViewSet(action_map={'get': action}, kwargs={},
+                         format_kwarg=None)
+    view.request = view.initialize_request(request)
+    return view.filter_queryset(view.get_queryset())
+
+
+def get_query_shapes():
+    """Запросы API в том виде, в котором их строят вьюсеты.
+
+    Общие страницы списка строятся без пользователя, как при заполнении
+    кэша, а личные поля добавляются отдельными запросами наложения.
+    """
+    user = User.objects.order_by('pk').first()
+    author = User.objects.order_by('-pk').first()
+    if user is None:
+        raise CommandError('Для разбора запросов нужен пользователь')
+    recipe = Recipe.objects.order_by('pk').first()
+    tag = Tag.objects.order_by('pk').first()
+    recipe_ids = [recipe.pk] if recipe else []
+    author_ids = [author.pk] if author else []
+    favorites, in_cart, subscriptions = get_overlay_querysets(
+        user, recipe_ids, author_ids
+    )
+    return {
+        'recipes': get_view_queryset(None)[:PAGE_SIZE],
+        'recipes_by_author': get_view_queryset(
+            None, {'author': author.pk}
+        )[:PAGE_SIZE],
+        'recipes_by_tag': get_view_queryset(
+            None, {'tags': tag.slug if tag else ''}
+        )[:PAGE_SIZE],
+        'recipes_favorited': get_view_queryset(
+            user, {'is_favorited': 1}
+        )[:PAGE_SIZE],
+        'recipes_in_cart': get_view_queryset(
+            user, {'is_in_shopping_cart': 1}
+        )[:PAGE_SIZE],
+        'recipe': get_view_queryset(None, action='retrieve').filter(
+            pk=recipe.pk if recipe else 0
+        ),
+        'overlay_favorites': favorites,
+        'overlay_shopping_cart': in_cart,
+        'overlay_subscriptions': subscriptions,
+        'overlay_state': get_relations_query(
+            RecipeViewSet().get_overlay_querysets(user)
+        ),
+        'recipe_ingredients': IngredientInRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'),
+        'subscriptions': User.objects.filter(
+            following__user=user
+        )[:PAGE_SIZE],
+        'shopping_list': get_cart_ingredients(user),
+    }
+
+
+def uses_full_scan(plan, limited):
+    """Есть ли в плане полное сканирование таблицы.
+
+    Упорядоченный обход таблицы без сортировки, который останавливается
+    на LIMIT, полным сканированием не считается.
+    """
+    plan = plan.lower()
+    ordered_walk = limited and 'temp b-tree for order by' not in plan
+    for line in plan.splitlines():
+        line = line.lstrip(' 0123456789|-`>')
+        if line.startswith('seq scan'):
+            return True
+        if line.startswith('scan') and not ordered_walk:
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов API и проверяет, '
+            'что они используют индексы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдено полное сканирование',
+        )
+
+    def handle(self, *args, **options):
+        full_scans = []
+        for name, queryset in get_query_shapes().items():
+            plan = queryset.explain()
+            if uses_full_scan(plan, queryset.query.high_mark is not None):
+                full_scans.append(name)
+                status = 'полное сканирование'
+            else:
+                status = 'индекс'
+            self.stdout.write(f'{name}: {status}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        self.stdout.write(
+            f'База: {connection.vendor}, '
+            f'запросов без индекса: {len(full_scans)}'
+        )
+        if full_scans and options['strict']:
+            raise CommandError(
+                'Запросы без индекса: ' + ', '.join(full_scans)
+            )
@@ -0,0 +1,74 @@
+import json
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientInRecipe, Recipe
+
+BATCH_SIZE = 1000
+
+
+def recipe_to_dict(recipe):
+    """Рецепт со ссылками по естественным ключам"""
+    return {
+        'id': recipe.pk,
+        'author': recipe.author.email,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'image_variants': recipe.image_variants,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {'name': row.ingredient.name,
+             'measurement_unit': row.ingredient.measurement_unit,
+             'amount': row.amount}
+            for row in recipe.recipe_ingr.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в формате JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            return self.export(sys.stdout, options['batch_size'],
+                               self.stderr)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            self.export(file, options['batch_size'], self.stdout)
+
+    def batches(self, batch_size):
+        """Рецепты пачками по возрастанию id"""
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('recipe_ingr',
+                     IngredientInRecipe.objects.select_related('ingredient')),
+        ).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].pk
+
+    def export(self, file, batch_size, report):
+        started = perf_counter()
+        exported = 0
+        for batch in self.batches(batch_size):
+            file.writelines(
+                json.dumps(recipe_to_dict(recipe), ensure_ascii=False) + '\n'
+                for recipe in batch
+            )
+            exported += len(batch)
+            elapsed = perf_counter() - started
+            report.write(f'Выгружено {exported} рецептов, '
+                         f'{exported / elapsed:.0f} строк/с')
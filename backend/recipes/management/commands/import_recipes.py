@@ -0,0 +1,154 @@
+import json
+import os
+from collections import Counter, defaultdict
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, Max
+
+from recipes.cache import invalidate_recipes_cache
+from recipes.feed import fan_out
+from recipes.matching import log_recipe_changes
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.search import update_search_documents
+from recipes.snapshots import update_snapshots
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['line']
+
+
+def write_checkpoint(path, line):
+    """Сохраняет номер последней загруженной строки атомарно"""
+    if not path:
+        return
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump({'line': line}, file)
+    os.replace(temporary, path)
+
+
+def create_recipes(recipes):
+    """Создает рецепты, назначая id заранее там, где база их не вернет"""
+    if not connection.features.can_return_rows_from_bulk_insert:
+        first_id = (Recipe.objects.aggregate(last=Max('id'))['last']
+                    or 0) + 1
+        for offset, recipe in enumerate(recipes):
+            recipe.pk = first_id + offset
+    return Recipe.objects.bulk_create(recipes)
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из файла JSON Lines пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл, созданный export_recipes')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки; '
+                 'при повторном запуске загрузка продолжится с него',
+        )
+
+    def handle(self, *args, **options):
+        self.authors = dict(User.objects.values_list('email', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        checkpoint = options['checkpoint']
+        skip = read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f'Продолжение после строки {skip}')
+        started = perf_counter()
+        recipes = rows = errors = 0
+        batch = []
+        number = skip
+        with open(options['input'], encoding='utf-8') as file:
+            for number, line in enumerate(file, 1):
+                if number <= skip or not line.strip():
+                    continue
+                try:
+                    batch.append(self.parse(line))
+                except (KeyError, TypeError, ValueError) as error:
+                    errors += 1
+                    self.stderr.write(f'Строка {number}: {error!r}')
+                if len(batch) >= options['batch_size']:
+                    recipes += len(batch)
+                    rows += self.save(batch)
+                    batch = []
+                    write_checkpoint(checkpoint, number)
+                    self.report(recipes, rows, started)
+            recipes += len(batch)
+            rows += self.save(batch)
+            write_checkpoint(checkpoint, number)
+        self.stdout.write('Итого:')
+        self.report(recipes, rows, started)
+        if errors:
+            self.stderr.write(f'Пропущено строк с ошибками: {errors}')
+
+    def report(self, recipes, rows, started):
+        elapsed = perf_counter() - started
+        self.stdout.write(f'Загружено {recipes} рецептов, {rows} строк, '
+                          f'{rows / elapsed:.0f} строк/с')
+
+    def parse(self, line):
+        data = json.loads(line)
+        recipe = Recipe(
+            author_id=self.authors[data['author']],
+            name=data['name'],
+            text=data['text'],
+            cooking_time=int(data['cooking_time']),
+            image=data.get('image', ''),
+            image_variants=data.get('image_variants') or {},
+        )
+        tags = list(dict.fromkeys(self.tags[slug] for slug in data['tags']))
+        ingredients = [
+            (self.ingredients[(item['name'], item['measurement_unit'])],
+             int(item['amount']))
+            for item in data['ingredients']
+        ]
+        return recipe, tags, ingredients
+
+    @transaction.atomic
+    def save(self, batch):
+        if not batch:
+            return 0
+        recipes = create_recipes([recipe for recipe, _, _ in batch])
+        tag_rows = Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, (_, tags, _) in zip(recipes, batch)
+            for tag_id in tags
+        ])
+        ingredient_rows = IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe_id=recipe.pk,
+                               ingredient_id=ingredient_id,
+                               amount=amount)
+            for recipe, (_, _, ingredients) in zip(recipes, batch)
+            for ingredient_id, amount in ingredients
+        ])
+        authors_by_count = defaultdict(list)
+        for author_id, count in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            authors_by_count[count].append(author_id)
+        for count, author_ids in authors_by_count.items():
+            User.objects.filter(pk__in=author_ids).update(
+                recipes_count=F('recipes_count') + count
+            )
+        update_search_documents([recipe.pk for recipe in recipes])
+        update_snapshots([recipe.pk for recipe in recipes])
+        log_recipe_changes([recipe.pk for recipe in recipes])
+        fan_out(recipes)
+        invalidate_recipes_cache()
+        return len(recipes) + len(tag_rows) + len(ingredient_rows)
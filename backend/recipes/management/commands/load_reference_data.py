@@ -0,0 +1,153 @@
+import csv
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from recipes.cache import invalidate_catalogue, invalidate_recipes_cache
+from recipes.models import Ingredient, Tag
+from recipes.snapshots import update_related_snapshots
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = ' \t\r\n,[]'
+
+REFERENCE_DATA = (
+    ('tags', Tag, ('slug',), ('name', 'color'), ('name', 'color', 'slug'),
+     'data/tags.csv'),
+    ('ingredients', Ingredient, ('name', 'measurement_unit'), (),
+     ('name', 'measurement_unit'), 'data/ingredients.json'),
+)
+
+
+def iter_json(file, chunk_size=CHUNK_SIZE):
+    """Объекты из JSON-массива или JSON Lines, читаемые по частям"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+            position += 1
+        if position < len(buffer):
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield value
+                continue
+        elif eof:
+            return
+        chunk = file.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+
+
+def iter_csv(file, columns):
+    for row in csv.reader(file):
+        if [value.strip() for value in row] == list(columns):
+            continue
+        yield dict(zip(columns, row)) if len(row) == len(columns) else None
+
+
+def read_rows(path, columns):
+    """Строки справочника из CSV, JSON или фикстуры Django"""
+    with open(path, encoding='utf-8') as file:
+        if path.endswith('.csv'):
+            yield from iter_csv(file, columns)
+            return
+        for value in iter_json(file):
+            if isinstance(value, dict):
+                value = value.get('fields', value)
+            yield value if isinstance(value, dict) else None
+
+
+class Command(BaseCommand):
+    help = ('Загружает теги и ингредиенты из CSV или JSON, добавляя '
+            'новые и обновляя изменившиеся записи')
+
+    def add_arguments(self, parser):
+        for name, *_, default in REFERENCE_DATA:
+            parser.add_argument(
+                f'--{name}', default=default,
+                help=f'Файл CSV или JSON, по умолчанию {default}; '
+                     'пустая строка пропускает загрузку',
+            )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        changed = False
+        self.updated_ids = {}
+        try:
+            with transaction.atomic():
+                for name, *spec, _ in REFERENCE_DATA:
+                    if options[name]:
+                        changed |= self.load(name, options[name],
+                                             options['batch_size'], *spec)
+                if self.updated_ids.get(Tag):
+                    update_related_snapshots(tags__in=self.updated_ids[Tag])
+                if changed:
+                    invalidate_catalogue()
+                    invalidate_recipes_cache()
+        except (IntegrityError, ValueError) as error:
+            raise CommandError(f'Загрузка отменена: {error}')
+        self.stdout.write(f'Время: {perf_counter() - started:.2f} с')
+
+    def load(self, name, path, batch_size,
+             model, key_fields, value_fields, columns):
+        existing = {
+            row[:len(key_fields)]: row[len(key_fields):]
+            for row in model.objects.values_list(
+                *key_fields, *value_fields, 'pk'
+            )
+        }
+        seen = set()
+        to_create = []
+        to_update = []
+        created = updated = unchanged = skipped = 0
+        for row in read_rows(path, columns):
+            try:
+                values = {field: str(row[field]).strip()
+                          for field in (*key_fields, *value_fields)}
+            except (KeyError, TypeError):
+                skipped += 1
+                continue
+            key = tuple(values[field] for field in key_fields)
+            if not all(key) or key in seen:
+                skipped += 1
+                continue
+            seen.add(key)
+            if key not in existing:
+                to_create.append(model(**values))
+            elif tuple(values[field] for field in value_fields) == (
+                existing[key][:-1]
+            ):
+                unchanged += 1
+            else:
+                to_update.append(model(pk=existing[key][-1], **values))
+            if len(to_create) >= batch_size:
+                created += len(model.objects.bulk_create(to_create))
+                to_create = []
+            if len(to_update) >= batch_size:
+                updated += self.update(model, to_update, value_fields)
+                to_update = []
+        created += len(model.objects.bulk_create(to_create))
+        if to_update:
+            updated += self.update(model, to_update, value_fields)
+        self.stdout.write(
+            f'{name}: добавлено {created}, обновлено {updated}, '
+            f'без изменений {unchanged}, пропущено {skipped}'
+        )
+        return bool(created or updated)
+
+    def update(self, model, objects, fields):
+        model.objects.bulk_update(objects, fields)
+        self.updated_ids.setdefault(model, []).extend(
+            obj.pk for obj in objects
+        )
+        return len(objects)
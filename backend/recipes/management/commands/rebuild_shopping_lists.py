@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import get_live_totals
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Проверяет и перестраивает списки покупок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить списки с корзинами, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.compare()
+        self.rebuild()
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        created = 0
+        for user_id, ingredient_id, total in get_live_totals().iterator():
+            batch.append(ShoppingListItem(user_id=user_id,
+                                          ingredient_id=ingredient_id,
+                                          total_amount=total))
+            if len(batch) >= BATCH_SIZE:
+                created += len(ShoppingListItem.objects.bulk_create(batch))
+                batch = []
+        created += len(ShoppingListItem.objects.bulk_create(batch))
+        self.stdout.write(f'Позиций в списках покупок: {created}')
+
+    def compare(self):
+        stored = ShoppingListItem.objects.filter(
+            total_amount__gt=0
+        ).values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        ).order_by('user_id', 'ingredient_id').iterator()
+        live = get_live_totals().iterator()
+        broken_users = set()
+        stored_row = next(stored, None)
+        live_row = next(live, None)
+        while stored_row or live_row:
+            if stored_row == live_row:
+                stored_row, live_row = next(stored, None), next(live, None)
+            elif live_row is None or (
+                stored_row and stored_row[:2] < live_row[:2]
+            ):
+                broken_users.add(stored_row[0])
+                stored_row = next(stored, None)
+            elif stored_row is None or live_row[:2] < stored_row[:2]:
+                broken_users.add(live_row[0])
+                live_row = next(live, None)
+            else:
+                broken_users.add(stored_row[0])
+                stored_row, live_row = next(stored, None), next(live, None)
+        self.stdout.write(
+            f'Пользователей с расхождениями: {len(broken_users)}'
+        )
+        for user_id in sorted(broken_users):
+            self.stdout.write(f'- {user_id}')
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.cache import invalidate_recipes_cache
+from recipes.models import Recipe, RecipeSnapshot
+from recipes.snapshots import (BATCH_SIZE,
+                               get_checksum,
+                               render_snapshots,
+                               update_snapshots)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет контрольные суммы готовых представлений рецептов '
+            'и пересобирает отсутствующие, устаревшие и поврежденные')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправляя',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать все представления без сверки',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        if options['all'] and not options['check']:
+            with transaction.atomic():
+                update_snapshots(recipe_ids)
+                invalidate_recipes_cache()
+            self.stdout.write(f'Пересобрано: {len(recipe_ids)}')
+            return
+        problems = {'missing': [], 'stale': [], 'corrupt': []}
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            stored = {
+                recipe_id: (data, checksum)
+                for recipe_id, data, checksum in RecipeSnapshot.objects.filter(
+                    recipe_id__in=batch
+                ).values_list('recipe_id', 'data', 'checksum')
+            }
+            for recipe_id, data in render_snapshots(batch).items():
+                if recipe_id not in stored:
+                    problems['missing'].append(recipe_id)
+                elif stored[recipe_id][1] != get_checksum(
+                    stored[recipe_id][0]
+                ):
+                    problems['corrupt'].append(recipe_id)
+                elif stored[recipe_id][1] != get_checksum(data):
+                    problems['stale'].append(recipe_id)
+        for name, label in (('missing', 'отсутствуют'),
+                            ('stale', 'устарели'),
+                            ('corrupt', 'повреждены')):
+            self.stdout.write(f'{label}: {len(problems[name])}')
+        broken = [recipe_id for ids in problems.values() for recipe_id in ids]
+        if broken and not options['check']:
+            with transaction.atomic():
+                update_snapshots(broken)
+                invalidate_recipes_cache()
+            self.stdout.write(f'Пересобрано: {len(broken)}')
@@ -0,0 +1,111 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from recipes.changelog import get_changes, get_log_version, log_changes
+from recipes.models import IngredientInRecipe
+
+CHANGES_KEY = 'recipes:ingredients:changes'
+
+
+def log_recipe_changes(recipe_ids):
+    """Отмечает рецепты, ингредиенты которых изменились"""
+    log_changes(CHANGES_KEY, recipe_ids)
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс ингредиентов рецептов.
+
+    Для каждого ингредиента хранит отсортированный массив id рецептов,
+    для каждого рецепта — набор его ингредиентов. Изменения из журнала
+    применяются к копиям затронутых массивов, поэтому читатели всегда
+    видят целостный снимок.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.index = ({}, {})
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def build():
+        postings = {}
+        recipes = {}
+        rows = IngredientInRecipe.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).order_by('ingredient_id', 'recipe_id').distinct()
+        for ingredient_id, recipe_id in rows.iterator():
+            postings.setdefault(ingredient_id, array('l')).append(recipe_id)
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        return postings, {recipe_id: frozenset(ingredients)
+                          for recipe_id, ingredients in recipes.items()}
+
+    @staticmethod
+    def apply(index, recipe_ids):
+        postings, recipes = index
+        postings = dict(postings)
+        recipes = dict(recipes)
+        current = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id__in=current
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        copied = set()
+
+        def posting(ingredient_id):
+            if ingredient_id not in copied:
+                postings[ingredient_id] = array(
+                    'l', postings.get(ingredient_id, ())
+                )
+                copied.add(ingredient_id)
+            return postings[ingredient_id]
+
+        for recipe_id, ingredients in current.items():
+            old = recipes.pop(recipe_id, frozenset())
+            for ingredient_id in old - ingredients:
+                recipe_ids = posting(ingredient_id)
+                position = bisect_left(recipe_ids, recipe_id)
+                if (position < len(recipe_ids)
+                        and recipe_ids[position] == recipe_id):
+                    del recipe_ids[position]
+                if not recipe_ids:
+                    del postings[ingredient_id]
+                    copied.discard(ingredient_id)
+            for ingredient_id in ingredients - old:
+                insort(posting(ingredient_id), recipe_id)
+            if ingredients:
+                recipes[recipe_id] = frozenset(ingredients)
+        return postings, recipes
+
+    def refresh(self):
+        if get_log_version(CHANGES_KEY) == self.version:
+            return
+        with self.lock:
+            version, changed = get_changes(CHANGES_KEY, self.version)
+            if version == self.version:
+                return
+            if changed is None:
+                self.index = self.build()
+            else:
+                self.index = self.apply(self.index, set(changed))
+            self.version = version
+
+    def search(self, ingredient_ids):
+        """Рецепты с совпадающими ингредиентами.
+
+        Возвращает пары (id рецепта, число совпадений), упорядоченные
+        по доле имеющихся ингредиентов рецепта, затем по числу
+        совпадений и от новых к старым.
+        """
+        self.refresh()
+        postings, recipes = self.index
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(postings.get(ingredient_id, ()))
+        return sorted(matches.items(), key=lambda item: (
+            -item[1] / len(recipes[item[0]]), -item[1], -item[0]
+        ))
+
+
+recipe_index = RecipeIngredientIndex()
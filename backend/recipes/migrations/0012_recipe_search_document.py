@@ -0,0 +1,84 @@
+# Generated by Django 3.2.3 on 2026-10-18 11:20
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX = 'recipe_search_idx'
+FTS_TABLE = 'recipes_recipe_fts'
+BATCH_SIZE = 500
+
+
+def fill_search_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        names = defaultdict(list)
+        for recipe_id, name in IngredientInRecipe.objects.filter(
+            recipe_id__in=batch
+        ).values_list('recipe_id', 'ingredient__name').order_by('id'):
+            names[recipe_id].append(name)
+        recipes = list(Recipe.objects.filter(pk__in=batch).only('text'))
+        for recipe in recipes:
+            recipe.search_document = '\n'.join(
+                (' '.join(names[recipe.pk]), recipe.text)
+            )
+        Recipe.objects.bulk_update(recipes, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        schema_editor.add_index(
+            apps.get_model('recipes', 'Recipe'),
+            GinIndex(
+                SearchVector('name', config=SEARCH_CONFIG, weight='A')
+                + SearchVector('search_document', config=SEARCH_CONFIG,
+                               weight='B'),
+                name=SEARCH_INDEX,
+            ),
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            f'USING fts5(name, search_document)'
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+            f"VALUES ('rank', 'bm25(10.0, 1.0)')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, search_document) '
+            f'SELECT id, name, search_document FROM recipes_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSnapshot',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('data', models.TextField(verbose_name='Представление')),
+                ('checksum', models.CharField(max_length=32, verbose_name='Контрольная сумма')),
+            ],
+            options={
+                'verbose_name': 'Представление рецепта',
+                'verbose_name_plural': 'Представления рецептов',
+            },
+        ),
+    ]
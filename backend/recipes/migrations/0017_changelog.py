@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-18 15:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_drop_ingredient_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('key', models.CharField(max_length=150, primary_key=True, serialize=False, verbose_name='Журнал')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'Журнал изменений',
+                'verbose_name_plural': 'Журналы изменений',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Номер')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Объект')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='recipes.changelog', verbose_name='Журнал')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала изменений',
+                'verbose_name_plural': 'Записи журнала изменений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['log', 'version'], name='changelog_entry_version_idx'),
+        ),
+    ]
@@ -1,8 +1,13 @@
 from colorfield.fields import ColorField
-from django.db import models
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, models
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Value,
+                              Window)
+from django.db.models.functions import RowNumber
 
 from core.constants import MAX_LENGTH_NAME, MAX_LENGTH_COLOR
-from users.models import User
+from core.managers import InsertIgnoreQuerySet
+from users.models import Subscription, User
 
 
 class Ingredient(models.Model):
@@ -25,6 +30,10 @@ class Ingredient(models.Model):
             models.UniqueConstraint(fields=['name', 'measurement_unit'],
                                     name='unique_ingridient')
         ]
+        indexes = [
+            models.Index(fields=['name'], opclasses=['varchar_pattern_ops'],
+                         name='ingredient_name_prefix_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} - {self.measurement_unit}'
@@ -58,6 +67,78 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов"""
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingr',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        if not user or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_author_subscribed=Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def latest_by_authors(self, author_ids, limit):
+        """Последние рецепты авторов и их количество одним запросом.
+
+        Возвращает словари {id автора: [рецепты]} и
+        {id автора: количество рецептов}. Учитывает фильтры кверисета.
+        Авторы без вернувшихся рецептов во второй словарь не попадают.
+        """
+        if not author_ids or limit <= 0:
+            return {}, {}
+        by_author = [F('author_id')]
+        ranked = self.filter(author_id__in=author_ids).order_by().annotate(
+            position=Window(RowNumber(), partition_by=by_author,
+                            order_by=F('id').desc()),
+            recipes_count=Window(Count('id'), partition_by=by_author),
+        ).values('id', 'name', 'image', 'image_variants', 'cooking_time',
+                 'author_id', 'position', 'recipes_count')
+        try:
+            query, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return {}, {}
+        quote = connection.ops.quote_name
+        recipes = self.raw(
+            f'SELECT * FROM ({query}) AS {quote("latest")} '
+            f'WHERE {quote("position")} <= %s '
+            f'ORDER BY {quote("author_id")}, {quote("id")} DESC',
+            [*params, limit],
+        )
+        latest = {}
+        counts = {}
+        for recipe in recipes:
+            latest.setdefault(recipe.author_id, []).append(recipe)
+            counts[recipe.author_id] = recipe.recipes_count
+        return latest, counts
+
+
 class Recipe(models.Model):
     """Модель рецепта"""
 
@@ -76,6 +157,11 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        'Уменьшенные изображения',
+        default=dict,
+        blank=True,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         'Время приготовления',
     )
@@ -90,16 +176,64 @@ class Recipe(models.Model):
         related_name='recipes',
         verbose_name='Теги',
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в корзину',
+        default=0,
+    )
+    search_document = models.TextField(
+        'Поисковый документ',
+        blank=True,
+        default='',
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeSnapshot(models.Model):
+    """Модель готового представления рецепта"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+        verbose_name='Рецепт',
+    )
+    data = models.TextField('Представление')
+    checksum = models.CharField(
+        'Контрольная сумма',
+        max_length=32,
+    )
+
+    class Meta:
+        verbose_name = 'Представление рецепта'
+        verbose_name_plural = 'Представления рецептов'
+
+    def __str__(self):
+        return f'Представление рецепта {self.recipe_id}'
+
+
 class IngredientInRecipe(models.Model):
     """Модель ингредиента в рецепте"""
 
@@ -122,6 +256,10 @@ class IngredientInRecipe(models.Model):
     class Meta:
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
+        indexes = [
+            models.Index(fields=['recipe', 'ingredient', 'amount'],
+                         name='ingredient_in_recipe_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -146,6 +284,8 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = InsertIgnoreQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -174,6 +314,8 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = InsertIgnoreQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
@@ -184,3 +326,114 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в корзину'
+
+
+class ShoppingListItem(models.Model):
+    """Модель позиции списка покупок"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.IntegerField(
+        'Количество',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique_feed_entry')
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class ChangeLog(models.Model):
+    """Модель номера журнала изменений"""
+
+    key = models.CharField(
+        'Журнал',
+        max_length=MAX_LENGTH_NAME,
+        primary_key=True,
+    )
+    version = models.PositiveBigIntegerField(
+        'Номер',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Журнал изменений'
+        verbose_name_plural = 'Журналы изменений'
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+
+class ChangeLogEntry(models.Model):
+    """Модель записи журнала изменений"""
+
+    log = models.ForeignKey(
+        ChangeLog,
+        on_delete=models.CASCADE,
+        related_name='entries',
+        verbose_name='Журнал',
+    )
+    version = models.PositiveBigIntegerField('Номер')
+    object_id = models.PositiveBigIntegerField('Объект')
+
+    class Meta:
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Записи журнала изменений'
+        indexes = [
+            models.Index(fields=['log', 'version'],
+                         name='changelog_entry_version_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.log_id}:{self.version} - {self.object_id}'
@@ -0,0 +1,41 @@
+from users.models import Subscription
+
+
+def get_overlay_querysets(user, recipe_ids, author_ids):
+    """Запросы избранного, корзины и подписок пользователя"""
+    return (
+        user.favorites.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True),
+        user.shopping_cart.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True),
+        Subscription.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True),
+    )
+
+
+def get_user_overlay(user, recipe_ids, author_ids):
+    """Множества избранного, корзины и подписок пользователя"""
+    return tuple(set(queryset) for queryset in get_overlay_querysets(
+        user, recipe_ids, author_ids
+    ))
+
+
+def apply_user_overlay(user, recipes):
+    """Проставляет пользовательские поля в общие представления рецептов"""
+    if not recipes or user.is_anonymous:
+        return recipes
+    favorited, in_cart, subscribed = get_user_overlay(
+        user,
+        [recipe['id'] for recipe in recipes],
+        {recipe['author']['id'] for recipe in recipes},
+    )
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in favorited
+        recipe['is_in_shopping_cart'] = recipe['id'] in in_cart
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in subscribed
+        )
+    return recipes
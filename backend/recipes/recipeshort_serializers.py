@@ -1,16 +1,25 @@
-from drf_extra_fields.fields import Base64ImageField
+from rest_framework.fields import SerializerMethodField
 from rest_framework.serializers import ModelSerializer
 
+from recipes.images import get_image_variant_urls
 from recipes.models import Recipe
 
 
 class RecipeShortSerializer(ModelSerializer):
     """Сериализатор краткого представления"""
 
-    image = Base64ImageField(
-        required=True,
-        allow_null=False)
+    image = SerializerMethodField()
+    image_variants = SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+        read_only_fields = fields
+
+    def get_image(self, obj):
+        if obj.image:
+            return obj.image.url
+        return None
+
+    def get_image_variants(self, obj):
+        return get_image_variant_urls(obj)
@@ -0,0 +1,95 @@
+import re
+from collections import defaultdict
+
+from django.db import connection
+
+from recipes.models import IngredientInRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+BATCH_SIZE = 500
+WORD = re.compile(r'\w+')
+
+
+def build_search_document(text, ingredient_names):
+    """Поисковый документ рецепта: ингредиенты и описание"""
+    return '\n'.join((' '.join(ingredient_names), text))
+
+
+def sync_fts(recipe_ids):
+    """Переносит документы рецептов в таблицу FTS5 SQLite"""
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, search_document) '
+            f'SELECT id, name, search_document FROM recipes_recipe '
+            f'WHERE id IN ({placeholders})',
+            recipe_ids,
+        )
+
+
+def update_search_documents(recipe_ids):
+    """Пересобирает поисковые документы рецептов.
+
+    Для удаленных рецептов только убирает их из индекса SQLite.
+    """
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        names = defaultdict(list)
+        for recipe_id, name in IngredientInRecipe.objects.filter(
+            recipe_id__in=batch
+        ).values_list('recipe_id', 'ingredient__name').order_by('id'):
+            names[recipe_id].append(name)
+        recipes = list(Recipe.objects.filter(pk__in=batch).only('text'))
+        for recipe in recipes:
+            recipe.search_document = build_search_document(
+                recipe.text, names[recipe.pk]
+            )
+        Recipe.objects.bulk_update(recipes, ['search_document'])
+        if connection.vendor == 'sqlite':
+            sync_fts(batch)
+
+
+def get_search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (SearchVector('name', config=SEARCH_CONFIG, weight='A')
+            + SearchVector('search_document', config=SEARCH_CONFIG,
+                           weight='B'))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, от более релевантных.
+
+    Каждое слово запроса ищется как префикс; на PostgreSQL по
+    GIN-индексу, на SQLite по таблице FTS5.
+    """
+    words = WORD.findall(query.lower())
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(
+            ' & '.join(f'{word}:*' for word in words),
+            config=SEARCH_CONFIG,
+            search_type='raw',
+        )
+        vector = get_search_vector()
+        queryset = queryset.alias(search_vector=vector).filter(
+            search_vector=search_query
+        ).annotate(search_rank=SearchRank(vector, search_query))
+    else:
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = recipes_recipe.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[' '.join(f'"{word}"*' for word in words)],
+            select={'search_rank': f'-{FTS_TABLE}.rank'},
+        )
+    return queryset.order_by('-search_rank', '-id')
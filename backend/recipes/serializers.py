@@ -1,17 +1,20 @@
 import re
 
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
-from rest_framework.exceptions import ValidationError
-from rest_framework.fields import IntegerField, SerializerMethodField
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import (IntegerField,
+                                   ListField,
+                                   SerializerMethodField)
 from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import (ModelSerializer,
                                         ReadOnlyField,
-                                        CurrentUserDefault)
+                                        CurrentUserDefault,
+                                        ListSerializer,
+                                        Serializer)
 
 from core.constants import (MIN_AMOUNT_MESSAGE,
                             MIN_TAG_MESSAGE,
-                            UNIQUE_TAG_MESSAGE,
                             VALIDATE_NAME_MESSAGE,
                             MIN_AMOUNT_TIME_OR_INGR,
                             MIN_TIME_MESSAGE,
@@ -19,13 +22,35 @@ from core.constants import (MIN_AMOUNT_MESSAGE,
                             MAX_INGR_MESSAGE,
                             MAX_AMOUNT_INGR,
                             MAX_AMOUNT_TIME,
-                            ERR_ALREADY_RECIPE)
+                            ERR_ALREADY_RECIPE,
+                            ERR_DEL_RECIPE,
+                            BATCH_MAX_SIZE,
+                            BATCH_ADDED,
+                            BATCH_EXISTS,
+                            BATCH_REMOVED,
+                            BATCH_ABSENT,
+                            BATCH_NOT_FOUND,
+                            NOT_FOUND_INGR_MESSAGE,
+                            NOT_FOUND_TAG_MESSAGE,
+                            REPEAT_INGR_MESSAGE,
+                            REPEAT_TAG_MESSAGE,
+                            COOK_MAX_INGREDIENTS)
+from recipes.cache import invalidate_recipes_cache
+from recipes.counters import shift_counter
+from recipes.feed import fan_out
+from recipes.fields import BulkPrimaryKeyRelatedField, fetch_by_ids
+from recipes.images import get_image_variant_urls, schedule_image_variants
 from recipes.models import (Ingredient,
                             Recipe,
                             Tag,
                             IngredientInRecipe,
                             Favorite,
                             ShoppingCart)
+from recipes.matching import log_recipe_changes
+from recipes.search import update_search_documents
+from recipes.shopping_list import (diff_amounts,
+                                   shopping_cart_changed,
+                                   update_shopping_lists)
 from users.models import User
 from users.serializers import FoodUserSerializer
 
@@ -37,6 +62,13 @@ class IngredientSerializer(ModelSerializer):
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
+    def to_representation(self, instance):
+        return {
+            'id': instance.id,
+            'name': instance.name,
+            'measurement_unit': instance.measurement_unit,
+        }
+
 
 class TagSerializer(ModelSerializer):
     """Сериализатор тега"""
@@ -45,6 +77,14 @@ class TagSerializer(ModelSerializer):
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
+    def to_representation(self, instance):
+        return {
+            'id': instance.id,
+            'name': instance.name,
+            'color': instance.color,
+            'slug': instance.slug,
+        }
+
 
 class IngredienterRecipeReadializer(ModelSerializer):
     """Сериализатор чтения ингредиента в рецепт"""
@@ -52,13 +92,22 @@ class IngredienterRecipeReadializer(ModelSerializer):
     id = IntegerField(source='ingredient.id')
     name = ReadOnlyField(source='ingredient.name')
     measurement_unit = ReadOnlyField(
-        source='ingredients.measurement_unit',
+        source='ingredient.measurement_unit',
     )
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def to_representation(self, instance):
+        ingredient = instance.ingredient
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': instance.amount,
+        }
+
 
 class RecipeReadSerializer(ModelSerializer):
     """Сериализатор чтения рецепта"""
@@ -69,6 +118,7 @@ class RecipeReadSerializer(ModelSerializer):
         many=True, source='recipe_ingr',
     )
     image = SerializerMethodField('get_image_url')
+    image_variants = SerializerMethodField()
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
@@ -83,37 +133,83 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        fields = self.fields
+        return {
+            'id': instance.id,
+            'tags': fields['tags'].to_representation(instance.tags.all()),
+            'author': fields['author'].to_representation(instance.author),
+            'ingredients': fields['ingredients'].to_representation(
+                instance.recipe_ingr.all()
+            ),
+            'is_favorited': self.get_is_favorited(instance),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(instance),
+            'name': instance.name,
+            'image': self.get_image_url(instance),
+            'image_variants': self.get_image_variants(instance),
+            'text': instance.text,
+            'cooking_time': instance.cooking_time,
+        }
+
     def get_image_url(self, obj):
         if obj.image:
             return obj.image.url
         return None
 
+    def get_image_variants(self, obj):
+        return get_image_variant_urls(obj)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         user = request.user if request else None
         return (user and not user.is_anonymous
                 and user.favorites.filter(recipe=obj).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         user = request.user if request else None
         return (user and not user.is_anonymous
                 and user.shopping_cart.filter(recipe=obj).exists())
 
 
+class IngredientInRecipeListSerializer(ListSerializer):
+    """Сериализатор списка ингредиентов рецепта"""
+
+    def to_internal_value(self, data):
+        ingredients_data = super().to_internal_value(data)
+        ingredients = fetch_by_ids(
+            Ingredient.objects.all(),
+            [ingredient_data['id'] for ingredient_data in ingredients_data],
+            NOT_FOUND_INGR_MESSAGE,
+            REPEAT_INGR_MESSAGE,
+        )
+        for ingredient_data, ingredient in zip(ingredients_data,
+                                               ingredients):
+            ingredient_data['id'] = ingredient
+        return ingredients_data
+
+
 class IngredientInRecipeWriteSerializer(ModelSerializer):
     """Сериализатор добавления ингредиента в рецепт"""
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IntegerField()
     amount = IntegerField()
 
     class Meta:
         model = Ingredient
         fields = ('id', 'amount')
+        list_serializer_class = IngredientInRecipeListSerializer
 
     def validate_amount(self, value):
         if value < MIN_AMOUNT_TIME_OR_INGR:
@@ -126,8 +222,12 @@ class IngredientInRecipeWriteSerializer(ModelSerializer):
 class RecipeWriteSerializer(ModelSerializer):
     """Сериализатор создания рецепта"""
 
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                  many=True)
+    tags = BulkPrimaryKeyRelatedField(
+        queryset=Tag.objects.all(),
+        many=True,
+        not_found_message=NOT_FOUND_TAG_MESSAGE,
+        repeat_message=REPEAT_TAG_MESSAGE,
+    )
     ingredients = IngredientInRecipeWriteSerializer(many=True)
     image = Base64ImageField()
 
@@ -152,11 +252,6 @@ class RecipeWriteSerializer(ModelSerializer):
     def validate_tags(self, value):
         if not value:
             raise ValidationError(MIN_TAG_MESSAGE)
-        tags_list = []
-        for tag in value:
-            if tag in tags_list:
-                raise ValidationError(UNIQUE_TAG_MESSAGE)
-            tags_list.append(tag)
         return value
 
     def validate_name(self, value):
@@ -175,6 +270,64 @@ class RecipeWriteSerializer(ModelSerializer):
             ingredients.append(recipe_ingredient)
         IngredientInRecipe.objects.bulk_create(ingredients)
 
+    @staticmethod
+    def diff_ingredients(recipe, rows, ingredients_data):
+        """Строки для добавления, изменения и удаления.
+
+        Новые данные сопоставляются с имеющимися строками по
+        ингредиенту, поэтому неизменные строки не трогаются.
+        """
+        unmatched = {}
+        for row in rows:
+            unmatched.setdefault(row.ingredient_id, []).append(row)
+        to_create = []
+        to_update = []
+        for ingredient_data in ingredients_data:
+            ingredient = ingredient_data['id']
+            amount = ingredient_data['amount']
+            matches = unmatched.get(ingredient.pk)
+            if not matches:
+                to_create.append(IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount,
+                ))
+                continue
+            row = matches.pop(0)
+            if row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        to_delete = [row.pk for rows in unmatched.values() for row in rows]
+        return to_create, to_update, to_delete
+
+    def update_ingredients(self, recipe, ingredients_data):
+        rows = list(IngredientInRecipe.objects.filter(recipe=recipe))
+        old_amounts = {}
+        for row in rows:
+            old_amounts[row.ingredient_id] = (
+                old_amounts.get(row.ingredient_id, 0) + row.amount
+            )
+        new_amounts = {}
+        for ingredient_data in ingredients_data:
+            ingredient_id = ingredient_data['id'].pk
+            new_amounts[ingredient_id] = (
+                new_amounts.get(ingredient_id, 0) + ingredient_data['amount']
+            )
+        to_create, to_update, to_delete = self.diff_ingredients(
+            recipe, rows, ingredients_data
+        )
+        if to_delete:
+            IngredientInRecipe.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            IngredientInRecipe.objects.bulk_create(to_create)
+        deltas = diff_amounts(old_amounts, new_amounts)
+        if deltas:
+            update_shopping_lists(
+                recipe.shopping_cart.values_list('user_id', flat=True),
+                deltas,
+            )
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
@@ -182,19 +335,39 @@ class RecipeWriteSerializer(ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
         self.add_ingredients(recipe, ingredients_data)
+        update_search_documents([recipe.pk])
+        log_recipe_changes([recipe.pk])
+        fan_out([recipe])
+        schedule_image_variants(recipe)
+        invalidate_recipes_cache()
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients', [])
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.add_ingredients(instance, ingredients)
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+            log_recipe_changes([instance.pk])
+        if tags is not None:
+            instance.tags.set(tags)
+        invalidate_recipes_cache()
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+            instance = super().update(instance, validated_data)
+            schedule_image_variants(instance)
+        else:
+            instance = super().update(instance, validated_data)
+        update_search_documents([instance.pk])
+        return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user if request else None
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context={
-            'request': self.context.get('request')
+            'request': request
         }).data
 
 
@@ -208,27 +381,28 @@ class FavoriteAddSerializer(ModelSerializer):
         model = Favorite
         fields = ('user', 'recipe')
 
-    def validate_faworite(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError(ERR_ALREADY_RECIPE)
-        return data
-
+    @transaction.atomic
     def create(self, validated_data):
         recipe = validated_data['recipe']
         user = validated_data['user']
-        return Favorite.objects.create(user=user, recipe=recipe)
+        if not Favorite.objects.insert_ignore(user=user, recipe=recipe):
+            raise ValidationError(ERR_ALREADY_RECIPE)
+        shift_counter(Recipe, 'favorites_count', [recipe.pk], 1)
+        return Favorite(user=user, recipe=recipe)
 
+    @transaction.atomic
     def delete(self, data):
         user = data['user']
         recipe = data['recipe']
-        return get_object_or_404(Favorite, user=user,
-                                 recipe=recipe).delete()
+        deleted, _ = Favorite.objects.filter(user=user,
+                                             recipe=recipe).delete()
+        if not deleted:
+            raise NotFound(ERR_DEL_RECIPE)
+        return deleted
 
 
 class ShoppingCartAddSerializer(ModelSerializer):
-    """Сериализатор добавления в избранное"""
+    """Сериализатор добавления в корзину"""
 
     recipe = PrimaryKeyRelatedField(queryset=Recipe.objects.all())
     user = PrimaryKeyRelatedField(queryset=User.objects.all())
@@ -237,20 +411,99 @@ class ShoppingCartAddSerializer(ModelSerializer):
         model = ShoppingCart
         fields = ('user', 'recipe')
 
-    def validate_shoppingcart(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError(ERR_ALREADY_RECIPE)
-        return data
-
+    @transaction.atomic
     def create(self, validated_data):
         recipe = validated_data['recipe']
         user = validated_data['user']
-        return ShoppingCart.objects.create(user=user, recipe=recipe)
+        if not ShoppingCart.objects.insert_ignore(user=user, recipe=recipe):
+            raise ValidationError(ERR_ALREADY_RECIPE)
+        shopping_cart_changed(user.pk, [recipe.pk], 1)
+        return ShoppingCart(user=user, recipe=recipe)
 
+    @transaction.atomic
     def delete(self, data):
         user = data['user']
         recipe = data['recipe']
-        return get_object_or_404(ShoppingCart, user=user,
-                                 recipe=recipe).delete()
+        deleted, _ = ShoppingCart.objects.filter(user=user,
+                                                 recipe=recipe).delete()
+        if not deleted:
+            raise NotFound(ERR_DEL_RECIPE)
+        return deleted
+
+
+class RecipeBatchSerializer(Serializer):
+    """Сериализатор пакетного добавления и удаления рецептов"""
+
+    model = None
+    counter = None
+
+    ids = ListField(child=IntegerField(), allow_empty=False,
+                    max_length=BATCH_MAX_SIZE)
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+    def recipes_changed(self, user, recipe_ids, sign):
+        shift_counter(Recipe, self.counter, recipe_ids, sign)
+
+    def add(self, user):
+        """Добавляет рецепты одним INSERT без конфликтов.
+
+        Добавленными считаются только строки, вернувшиеся из INSERT,
+        поэтому параллельные запросы не увеличивают счетчики дважды.
+        """
+        ids = self.validated_data['ids']
+        found = set(Recipe.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        with transaction.atomic():
+            added = self.model.objects.insert_ignore_many(
+                [{'user': user, 'recipe_id': pk}
+                 for pk in ids if pk in found],
+                'recipe_id',
+            )
+            self.recipes_changed(user, added, 1)
+        return [
+            {'id': pk,
+             'status': (BATCH_NOT_FOUND if pk not in found
+                        else BATCH_ADDED if pk in added else BATCH_EXISTS)}
+            for pk in ids
+        ]
+
+    @transaction.atomic
+    def remove(self, user):
+        """Удаляет рецепты одним DELETE, учитывая вернувшиеся строки"""
+        ids = self.validated_data['ids']
+        removed = self.model.objects.filter(
+            user=user, recipe_id__in=ids
+        ).delete_returning('recipe_id')
+        self.recipes_changed(user, removed, -1)
+        return [
+            {'id': pk,
+             'status': BATCH_REMOVED if pk in removed else BATCH_ABSENT}
+            for pk in ids
+        ]
+
+
+class FavoriteBatchSerializer(RecipeBatchSerializer):
+    """Сериализатор пакетной работы с избранным"""
+
+    model = Favorite
+    counter = 'favorites_count'
+
+
+class ShoppingCartBatchSerializer(RecipeBatchSerializer):
+    """Сериализатор пакетной работы с корзиной"""
+
+    model = ShoppingCart
+
+    def recipes_changed(self, user, recipe_ids, sign):
+        shopping_cart_changed(user.pk, recipe_ids, sign)
+
+
+class CookQuerySerializer(Serializer):
+    """Сериализатор набора ингредиентов для подбора рецептов"""
+
+    ingredients = ListField(child=IntegerField(min_value=1),
+                            allow_empty=False,
+                            max_length=COOK_MAX_INGREDIENTS)
@@ -0,0 +1,231 @@
+import csv
+import hashlib
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from rest_framework.renderers import BaseRenderer
+
+from recipes.counters import shift_counter
+from recipes.models import (IngredientInRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem)
+
+UNIT_FACTORS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Рендер списка покупок в текст"""
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендер списка покупок в CSV"""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+def get_recipe_amounts(recipe, sign=1):
+    """Количества ингредиентов рецепта по их id"""
+    return get_recipes_amounts([recipe], sign)
+
+
+def get_recipes_amounts(recipes, sign=1):
+    """Суммарные количества ингредиентов нескольких рецептов"""
+    amounts = {}
+    for ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe__in=recipes
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] = amounts.get(ingredient_id, 0) + sign * amount
+    return amounts
+
+
+def diff_amounts(old, new):
+    return {
+        ingredient_id: new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        for ingredient_id in old.keys() | new.keys()
+        if new.get(ingredient_id, 0) != old.get(ingredient_id, 0)
+    }
+
+
+def update_shopping_lists(user_ids, deltas):
+    """Прибавляет изменения количеств к спискам покупок пользователей"""
+    user_ids = list(user_ids)
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True,
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas.keys()
+    )
+    items.update(total_amount=F('total_amount') + Case(
+        *(When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in deltas.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    items.filter(total_amount__lte=0).delete()
+
+
+def shopping_cart_changed(user_id, recipe_ids, sign):
+    """Учитывает рецепты, добавленные в корзину или убранные из нее.
+
+    Общий путь для сигналов корзины и пакетных запросов, которые пишут
+    в корзину без сигналов.
+    """
+    if not recipe_ids:
+        return
+    shift_counter(Recipe, 'in_carts_count', recipe_ids, sign)
+    update_shopping_lists([user_id], get_recipes_amounts(recipe_ids, sign))
+
+
+@contextmanager
+def track_recipe_amounts(recipe_ids):
+    """Переносит в списки покупок правки ингредиентов рецептов в блоке"""
+    old_amounts = {pk: get_recipe_amounts(pk) for pk in recipe_ids}
+    yield
+    for pk, amounts in old_amounts.items():
+        deltas = diff_amounts(amounts, get_recipe_amounts(pk))
+        if deltas:
+            update_shopping_lists(
+                ShoppingCart.objects.filter(recipe_id=pk).values_list(
+                    'user_id', flat=True
+                ),
+                deltas,
+            )
+
+
+def get_cart_ingredients(user):
+    """Суммы ингредиентов корзины, упорядоченные по названию"""
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount',
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    )
+
+
+def get_shopping_list_etag(user, export_format):
+    """ETag списка покупок по его строкам, формату и дате"""
+    digest = hashlib.md5(
+        f'{export_format}:{user.get_full_name()}:'
+        f'{datetime.today():%Y-%m-%d}'.encode()
+    )
+    for row in ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount',
+    ).order_by('ingredient_id').iterator():
+        digest.update(f'{row}'.encode())
+    return digest.hexdigest()
+
+
+def get_live_totals():
+    """Суммы ингредиентов по корзинам, посчитанные по рецептам"""
+    return IngredientInRecipe.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values_list(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by(
+        'recipe__shopping_cart__user', 'ingredient'
+    )
+
+
+def normalize_units(ingredients):
+    """Приводит единицы к базовым и суммирует одинаковые ингредиенты.
+
+    Ожидает строки, упорядоченные по названию, поэтому в памяти
+    хранятся суммы только текущего ингредиента.
+    """
+    current_name = None
+    totals = {}
+    for name, unit, amount in ingredients:
+        if name != current_name:
+            for base_unit, total in totals.items():
+                yield current_name, base_unit, total
+            current_name = name
+            totals = {}
+        base_unit, factor = UNIT_FACTORS.get(unit, (unit, 1))
+        totals[base_unit] = totals.get(base_unit, 0) + amount * factor
+    for base_unit, total in totals.items():
+        yield current_name, base_unit, total
+
+
+def write_txt(user, ingredients):
+    today = datetime.today()
+    yield (f'Дата: {today:%Y-%m-%d}\n\n'
+           f'{user.get_full_name()} должен купить:\n\n')
+    separator = ''
+    for name, unit, amount in ingredients:
+        yield f'{separator}- {name} ({unit}) - {amount}'
+        separator = '\n'
+    yield f'\n\nпроект Foodgram ({today:%Y})'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def write_csv(user, ingredients):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in ingredients:
+        yield writer.writerow(row)
+
+
+def write_json(user, ingredients):
+    yield json.dumps({
+        'date': f'{datetime.today():%Y-%m-%d}',
+        'user': user.get_full_name(),
+    }, ensure_ascii=False)[:-1] + ', "ingredients": ['
+    separator = ''
+    for name, unit, amount in ingredients:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']}'
+
+
+WRITERS = {
+    'txt': write_txt,
+    'csv': write_csv,
+    'json': write_json,
+}
+
+
+def stream_shopping_list(user, export_format):
+    """Построчно формирует список покупок в нужном формате"""
+    return WRITERS[export_format](
+        user, normalize_units(get_cart_ingredients(user).iterator())
+    )
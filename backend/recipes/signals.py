@@ -0,0 +1,134 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .cache import invalidate_catalogue, invalidate_recipes_cache
+from .counters import shift_counter
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .matching import log_recipe_changes
+from .search import update_search_documents
+from .shopping_list import shopping_cart_changed
+from .snapshots import (AUTHOR_FIELDS, drop_related_snapshots,
+                        update_related_snapshots)
+from users.models import Subscription, User
+
+
+def lock_row(instance):
+    """Блокирует строку до конца транзакции; False, если ее уже удалили"""
+    return type(instance).objects.select_for_update().filter(
+        pk=instance.pk
+    ).exists()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalogue_changed(sender, **kwargs):
+    invalidate_catalogue()
+    invalidate_recipes_cache()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_search_documents(
+            instance.ingr_recipes.values_list('recipe_id', flat=True)
+        )
+        update_related_snapshots(ingredients=instance)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_related_snapshots(tags=instance)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    drop_related_snapshots(tags=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    drop_related_snapshots(ingredients=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    update_search_documents([instance.pk])
+    log_recipe_changes([instance.pk])
+    invalidate_recipes_cache()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, 'recipes_count', [instance.author_id], 1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    if lock_row(instance):
+        shift_counter(User, 'recipes_count', [instance.author_id], -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(Recipe, 'favorites_count', [instance.recipe_id], 1)
+
+
+@receiver(pre_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    if lock_row(instance):
+        shift_counter(Recipe, 'favorites_count', [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        shopping_cart_changed(instance.user_id, [instance.recipe_id], 1)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    if lock_row(instance):
+        shopping_cart_changed(instance.user_id, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(User, 'followers_count', [instance.author_id], 1)
+
+
+@receiver(pre_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    if lock_row(instance):
+        shift_counter(User, 'followers_count', [instance.author_id], -1)
+
+
+@receiver(pre_save, sender=User)
+def author_changing(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, поменялись ли поля автора из представлений рецептов"""
+    instance.author_fields_changed = False
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    stored = User.objects.filter(pk=instance.pk).values(
+        *AUTHOR_FIELDS
+    ).first()
+    instance.author_fields_changed = stored is not None and any(
+        stored[field] != getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, **kwargs):
+    if created or not instance.author_fields_changed:
+        return
+    update_related_snapshots(author=instance)
+    invalidate_recipes_cache()
@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+from django.db.models import Manager
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from recipes.models import Recipe, RecipeSnapshot
+from recipes.serializers import RecipeReadSerializer
+
+BATCH_SIZE = 500
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def get_checksum(data):
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def render_snapshots(recipe_ids):
+    """Представления рецептов без пользовательских полей"""
+    return {
+        recipe.pk: json.dumps(RecipeReadSerializer(recipe).data,
+                              ensure_ascii=False)
+        for recipe in Recipe.objects.with_related().with_user_flags(
+            None
+        ).filter(pk__in=recipe_ids)
+    }
+
+
+def update_snapshots(recipe_ids):
+    """Пересобирает готовые представления рецептов.
+
+    Недостающие строки вставляются с пропуском конфликтов, затем все
+    перезаписываются, поэтому параллельная сборка того же рецепта
+    не приводит к ошибке и не оставляет устаревших данных.
+    Возвращает словарь {id рецепта: представление}.
+    """
+    recipe_ids = list(recipe_ids)
+    snapshots = {}
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        rendered = render_snapshots(recipe_ids[start:start + BATCH_SIZE])
+        batch = [
+            RecipeSnapshot(recipe_id=recipe_id, data=data,
+                           checksum=get_checksum(data))
+            for recipe_id, data in rendered.items()
+        ]
+        RecipeSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+        RecipeSnapshot.objects.bulk_update(batch, ['data', 'checksum'])
+        snapshots.update(
+            (snapshot.recipe_id, snapshot) for snapshot in batch
+        )
+    return snapshots
+
+
+def update_related_snapshots(**lookups):
+    """Пересобирает представления рецептов, подходящих под условия"""
+    return update_snapshots(Recipe.objects.filter(**lookups).order_by(
+    ).values_list('pk', flat=True).distinct())
+
+
+def drop_related_snapshots(**lookups):
+    """Удаляет представления, они соберутся заново при чтении"""
+    RecipeSnapshot.objects.filter(
+        recipe__in=Recipe.objects.filter(**lookups).values('pk')
+    ).delete()
+
+
+def get_snapshot(recipe):
+    try:
+        return recipe.snapshot
+    except RecipeSnapshot.DoesNotExist:
+        return None
+
+
+class RecipeSnapshotListSerializer(ListSerializer):
+    """Собирает недостающие представления всей страницы разом"""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        missing = [recipe.pk for recipe in recipes
+                   if get_snapshot(recipe) is None]
+        if missing:
+            snapshots = update_snapshots(missing)
+            for recipe in recipes:
+                if recipe.pk in snapshots:
+                    recipe.snapshot = snapshots[recipe.pk]
+        return super().to_representation(recipes)
+
+
+class RecipeSnapshotSerializer(BaseSerializer):
+    """Сериализатор чтения рецепта из готового представления"""
+
+    class Meta:
+        list_serializer_class = RecipeSnapshotListSerializer
+
+    def to_representation(self, instance):
+        snapshot = get_snapshot(instance)
+        if snapshot is None:
+            snapshot = update_snapshots([instance.pk]).get(instance.pk)
+        if snapshot is None:
+            return RecipeReadSerializer(instance, context=self.context).data
+        data = json.loads(snapshot.data)
+        data['is_favorited'] = getattr(instance, 'is_favorited', False)
+        data['is_in_shopping_cart'] = getattr(
+            instance, 'is_in_shopping_cart', False
+        )
+        data['author']['is_subscribed'] = getattr(
+            instance, 'is_author_subscribed', False
+        )
+        return data
@@ -0,0 +1,524 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.autocomplete import IngredientIndex
+from recipes.matching import RecipeIngredientIndex
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
+from recipes.search import update_search_documents
+from recipes.snapshots import update_snapshots
+from users.models import Subscription, User
+
+RECIPES_COUNT = 12
+PARALLEL_REQUESTS = 8
+
+
+def create_recipes(author, tag, ingredient, count):
+    """Создает рецепты с тегом, ингредиентом и готовыми снимками"""
+    recipes = [
+        Recipe.objects.create(author=author, name=f'Рецепт {number}',
+                              text='Описание', image='recipes/test.png',
+                              cooking_time=10)
+        for number in range(count)
+    ]
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag) for recipe in recipes
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=100)
+        for recipe in recipes
+    )
+    update_snapshots([recipe.pk for recipe in recipes])
+    return recipes
+
+
+class RecipeFixtureMixin:
+    """Общие данные для тестов рецептов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(name='мука',
+                                                   measurement_unit='г')
+        cls.recipes = create_recipes(cls.author, cls.tag, cls.ingredient,
+                                     RECIPES_COUNT)
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[1])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous_client = APIClient()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+
+
+class RecipeListQueriesTest(RecipeFixtureMixin, TestCase):
+    """Число запросов страницы рецептов не зависит от ее размера"""
+
+    ANONYMOUS_QUERIES = 3
+    AUTHENTICATED_QUERIES = 7
+
+    def assert_list_queries(self, client, queries):
+        for limit in (3, RECIPES_COUNT):
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries(self):
+        self.assert_list_queries(self.anonymous_client,
+                                 self.ANONYMOUS_QUERIES)
+
+    def test_authenticated_list_queries(self):
+        self.assert_list_queries(self.reader_client,
+                                 self.AUTHENTICATED_QUERIES)
+
+    def test_authenticated_list_flags(self):
+        response = self.reader_client.get(
+            f'/api/recipes/?limit={RECIPES_COUNT}'
+        )
+        flags = {
+            recipe['id']: (recipe['is_favorited'],
+                           recipe['is_in_shopping_cart'],
+                           recipe['author']['is_subscribed'])
+            for recipe in response.data['results']
+        }
+        self.assertEqual(flags[self.recipes[0].pk], (True, False, True))
+        self.assertEqual(flags[self.recipes[1].pk], (False, True, True))
+        self.assertEqual(flags[self.recipes[2].pk], (False, False, True))
+
+
+class RecipeConditionalGetTest(RecipeFixtureMixin, TestCase):
+    """Ответы 304 на If-None-Match для рецептов"""
+
+    def assert_not_modified(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def assert_modified(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified(self):
+        urls = (
+            '/api/recipes/',
+            f'/api/recipes/{self.recipes[0].pk}/',
+            '/api/recipes/?tags=breakfast',
+            f'/api/recipes/?author={self.author.pk}&limit=3',
+        )
+        for client in (self.anonymous_client, self.reader_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assert_not_modified(client, url)
+
+    def test_changed_after_write(self):
+        recipe = self.recipes[0]
+        author_client = APIClient()
+        author_client.force_authenticate(self.author)
+        urls = ('/api/recipes/', f'/api/recipes/{recipe.pk}/',
+                '/api/recipes/?tags=breakfast')
+        etags = [self.assert_not_modified(self.anonymous_client, url)
+                 for url in urls]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = author_client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'name': 'Новое название', 'tags': [self.tag.pk],
+                 'ingredients': [{'id': self.ingredient.pk, 'amount': 50}]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                self.assert_modified(self.anonymous_client, url, etag)
+
+    def test_changed_after_overlay_change(self):
+        recipe = self.recipes[2]
+        url = f'/api/recipes/{recipe.pk}/'
+        reader_etag = self.assert_not_modified(self.reader_client, url)
+        anonymous_etag = self.assert_not_modified(self.anonymous_client, url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.reader_client.post(f'{url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assert_modified(self.reader_client, url, reader_etag)
+        response = self.anonymous_client.get(
+            url, HTTP_IF_NONE_MATCH=anonymous_etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class IngredientCatalogueTest(RecipeFixtureMixin, TestCase):
+    """Справочник ингредиентов фильтруется только для ответа с телом"""
+
+    def test_prefix_filter(self):
+        for name in ('мускат', 'Мука ржаная', 'соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        response = self.anonymous_client.get('/api/ingredients/?name=му')
+        self.assertEqual([item['name'] for item in response.data],
+                         ['мука', 'мускат'])
+
+    def test_not_modified_skips_filter(self):
+        url = '/api/ingredients/?name=му'
+        etag = self.anonymous_client.get(url)['ETag']
+        with mock.patch.object(IngredientIndex, 'starting_with') as search:
+            response = self.anonymous_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        search.assert_not_called()
+
+
+class RecipeSearchPaginationTest(RecipeFixtureMixin, TestCase):
+    """Курсор не сбрасывает сортировку результатов поиска"""
+
+    def test_cursor_keeps_search_order(self):
+        update_search_documents([recipe.pk for recipe in self.recipes])
+        url = '/api/recipes/?search=мука&limit=5'
+        ranked = self.anonymous_client.get(url)
+        self.assertEqual(ranked.data['count'], RECIPES_COUNT)
+        response = self.anonymous_client.get(f'{url}&cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], RECIPES_COUNT)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [item['id'] for item in ranked.data['results']])
+
+    def test_cursor_without_search(self):
+        response = self.anonymous_client.get('/api/recipes/?cursor=&limit=5')
+        self.assertNotIn('count', response.data)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [recipe.pk for recipe in self.recipes[::-1][:5]])
+
+
+class LatestByAuthorsTest(RecipeFixtureMixin, TestCase):
+    """Последние рецепты авторов с учетом фильтров кверисета"""
+
+    def test_latest_recipes(self):
+        latest, counts = Recipe.objects.latest_by_authors(
+            [self.author.pk, self.reader.pk], 2
+        )
+        self.assertEqual([recipe.pk for recipe in latest[self.author.pk]],
+                         [recipe.pk for recipe in self.recipes[:-3:-1]])
+        self.assertEqual(counts, {self.author.pk: RECIPES_COUNT})
+
+    def test_chained_filters(self):
+        recipe = self.recipes[3]
+        latest, counts = Recipe.objects.filter(
+            name=recipe.name
+        ).latest_by_authors([self.author.pk], 2)
+        self.assertEqual(latest, {self.author.pk: [recipe]})
+        self.assertEqual(counts, {self.author.pk: 1})
+        self.assertEqual(
+            Recipe.objects.none().latest_by_authors([self.author.pk], 2),
+            ({}, {}),
+        )
+
+
+class CounterTest(RecipeFixtureMixin, TestCase):
+    """Счетчики совпадают при записи через API, ORM и каскады"""
+
+    def assertCounters(self, recipe, favorites, in_carts):
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count),
+            (favorites, in_carts),
+        )
+
+    def test_fixture_counters(self):
+        self.assertCounters(self.recipes[0], 1, 0)
+        self.assertCounters(self.recipes[1], 0, 1)
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.recipes_count, self.author.followers_count),
+            (RECIPES_COUNT, 1),
+        )
+
+    def test_unfavorite_created_outside_api(self):
+        recipe = self.recipes[3]
+        Favorite.objects.create(user=self.author, recipe=recipe)
+        self.assertCounters(recipe, 1, 0)
+        author_client = APIClient()
+        author_client.force_authenticate(self.author)
+        response = author_client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(recipe, 0, 0)
+
+    def test_delete_with_drifted_counters(self):
+        Recipe.objects.filter(pk__in=(self.recipes[0].pk,
+                                      self.recipes[1].pk)).update(
+            favorites_count=0, in_carts_count=0
+        )
+        for recipe, path in ((self.recipes[0], 'favorite'),
+                             (self.recipes[1], 'shopping_cart')):
+            with self.subTest(path=path):
+                response = self.reader_client.delete(
+                    f'/api/recipes/{recipe.pk}/{path}/'
+                )
+                self.assertEqual(response.status_code, 204)
+                self.assertCounters(recipe, 0, 0)
+
+    def test_cascade_delete(self):
+        self.reader.delete()
+        self.assertCounters(self.recipes[0], 0, 0)
+        self.assertCounters(self.recipes[1], 0, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.recipes[2].delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, RECIPES_COUNT - 1)
+
+
+class ShoppingListTest(RecipeFixtureMixin, TestCase):
+    """Список покупок совпадает с корзиной при любом пути записи"""
+
+    def get_amounts(self):
+        return dict(self.reader.shopping_list.values_list(
+            'ingredient_id', 'total_amount'
+        ))
+
+    def test_orm_and_api_writes(self):
+        self.assertEqual(self.get_amounts(), {self.ingredient.pk: 100})
+        recipe = self.recipes[2]
+        ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        self.assertEqual(self.get_amounts(), {self.ingredient.pk: 200})
+        response = self.reader_client.delete(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_amounts(), {self.ingredient.pk: 100})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.in_carts_count, 0)
+
+    def test_admin_ingredient_edit(self):
+        recipe = self.recipes[1]
+        row = recipe.recipe_ingr.get()
+        admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin',
+            first_name='Админ', last_name='Админов', password='password'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.pk}/change/',
+            {
+                'name': recipe.name,
+                'author': self.author.pk,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [self.tag.pk],
+                'recipe_ingr-TOTAL_FORMS': 1,
+                'recipe_ingr-INITIAL_FORMS': 1,
+                'recipe_ingr-MIN_NUM_FORMS': 0,
+                'recipe_ingr-MAX_NUM_FORMS': 1000,
+                'recipe_ingr-0-id': row.pk,
+                'recipe_ingr-0-recipe': recipe.pk,
+                'recipe_ingr-0-ingredient': self.ingredient.pk,
+                'recipe_ingr-0-amount': 250,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_amounts(), {self.ingredient.pk: 250})
+
+
+class BatchTest(RecipeFixtureMixin, TestCase):
+    """Пакетные запросы стоят одинаково при любом размере пакета"""
+
+    def count_queries(self, method, url, ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.reader_client, method)(
+                url, {'ids': ids}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_batch_queries(self):
+        small = [recipe.pk for recipe in self.recipes[2:4]]
+        large = [recipe.pk for recipe in self.recipes[4:]]
+        for path in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{path}/batch/'
+            with self.subTest(path=path):
+                for method in ('post', 'delete'):
+                    small_queries, _ = self.count_queries(method, url, small)
+                    large_queries, data = self.count_queries(method, url,
+                                                             large)
+                    self.assertEqual(small_queries, large_queries)
+                    self.assertEqual(
+                        {item['status'] for item in data},
+                        {'added' if method == 'post' else 'removed'},
+                    )
+
+    def test_batch_statuses_and_counters(self):
+        recipe = self.recipes[0]
+        url = '/api/recipes/favorite/batch/'
+        _, data = self.count_queries('post', url, [recipe.pk, 0])
+        self.assertEqual([item['status'] for item in data],
+                         ['exists', 'not_found'])
+        _, data = self.count_queries('delete', url, [recipe.pk, recipe.pk])
+        self.assertEqual([item['status'] for item in data], ['removed'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+        _, data = self.count_queries('delete', url, [recipe.pk])
+        self.assertEqual([item['status'] for item in data], ['absent'])
+
+
+class AuthorSnapshotTest(RecipeFixtureMixin, TestCase):
+    """Представления рецептов пересобираются только при смене автора"""
+
+    def assert_snapshots_untouched(self, save):
+        with CaptureQueriesContext(connection) as queries:
+            save()
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'recipes_recipesnapshot' in query['sql']
+        ])
+
+    def test_rename_updates_snapshots(self):
+        self.author.first_name = 'Шеф'
+        self.author.save()
+        response = self.anonymous_client.get(
+            f'/api/recipes/{self.recipes[0].pk}/'
+        )
+        self.assertEqual(response.data['author']['first_name'], 'Шеф')
+
+    def test_unrelated_saves_skip_snapshots(self):
+        def change_password():
+            self.author.set_password('new-password')
+            self.author.save()
+
+        def log_in():
+            self.author.save(update_fields=['last_login'])
+
+        def sign_up():
+            User.objects.create_user(
+                email='new@foodgram.ru', username='new',
+                first_name='Новый', last_name='Автор', password='password'
+            )
+
+        for save in (change_password, log_in, sign_up):
+            with self.subTest(save=save.__name__):
+                self.assert_snapshots_untouched(save)
+
+
+class RecipeIndexChangeLogTest(RecipeFixtureMixin, TestCase):
+    """Индексы разных процессов видят изменения без общего кэша"""
+
+    def test_indexes_apply_logged_changes(self):
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        indexes = (RecipeIngredientIndex(), RecipeIngredientIndex())
+        for index in indexes:
+            self.assertEqual(index.search([salt.pk]), [])
+        author_client = APIClient()
+        author_client.force_authenticate(self.author)
+        response = author_client.patch(
+            f'/api/recipes/{self.recipes[0].pk}/',
+            {'ingredients': [{'id': salt.pk, 'amount': 5}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        for index in indexes:
+            cache.clear()
+            version = index.version
+            self.assertEqual(index.search([salt.pk]),
+                             [(self.recipes[0].pk, 1)])
+            self.assertEqual(index.version, version + 1)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentAddTest(TransactionTestCase):
+    """Параллельные добавления создают ровно одну запись"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        self.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                 slug='breakfast')
+        ingredient = Ingredient.objects.create(name='мука',
+                                               measurement_unit='г')
+        self.recipe, = create_recipes(self.author, tag, ingredient, 1)
+
+    def post_in_parallel(self, url):
+        barrier = threading.Barrier(PARALLEL_REQUESTS)
+        statuses = []
+
+        def post():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(self.reader)
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post)
+                   for _ in range(PARALLEL_REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_added_once(self, statuses, rows):
+        self.assertEqual(statuses,
+                         [201] + [400] * (PARALLEL_REQUESTS - 1))
+        self.assertEqual(rows.count(), 1)
+
+    def test_parallel_favorite(self):
+        statuses = self.post_in_parallel(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assert_added_once(statuses, Favorite.objects.filter(
+            user=self.reader, recipe=self.recipe
+        ))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_parallel_shopping_cart(self):
+        statuses = self.post_in_parallel(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        )
+        self.assert_added_once(statuses, ShoppingCart.objects.filter(
+            user=self.reader, recipe=self.recipe
+        ))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.in_carts_count, 1)
+        self.assertEqual(
+            list(self.reader.shopping_list.values_list('total_amount',
+                                                       flat=True)),
+            [100],
+        )
+
+    def test_parallel_subscribe(self):
+        statuses = self.post_in_parallel(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assert_added_once(statuses, Subscription.objects.filter(
+            user=self.reader, author=self.author
+        ))
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
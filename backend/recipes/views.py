@@ -1,12 +1,17 @@
-from datetime import datetime
-
-from django.db import models
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Ingredient, IngredientInRecipe,
-                            Recipe, Tag)
+from recipes.models import (Favorite,
+                            Ingredient,
+                            Recipe,
+                            ShoppingCart,
+                            Tag)
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import (SAFE_METHODS,
                                         IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
@@ -14,38 +19,112 @@ from rest_framework.response import Response
 from rest_framework.status import (HTTP_400_BAD_REQUEST,
                                    HTTP_204_NO_CONTENT,
                                    HTTP_201_CREATED)
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from .filters import IngredientFilter, RecipeFilter
-from .serializers import (IngredientSerializer,
-                          RecipeReadSerializer,
+from .autocomplete import ingredient_index
+from .catalogue import catalogue
+from .cache import (get_cached_page,
+                    get_catalogue_version,
+                    set_cached_page)
+from .feed import get_feed_ids
+from .filters import RecipeFilter
+from .matching import recipe_index
+from .overlay import apply_user_overlay
+from .snapshots import RecipeSnapshotSerializer, update_snapshots
+from .shopping_list import (CSVRenderer,
+                            PlainTextRenderer,
+                            get_shopping_list_etag,
+                            stream_shopping_list)
+from .serializers import (CookQuerySerializer,
+                          IngredientSerializer,
                           RecipeWriteSerializer,
                           TagSerializer,
                           FavoriteAddSerializer,
-                          ShoppingCartAddSerializer)
+                          FavoriteBatchSerializer,
+                          ShoppingCartAddSerializer,
+                          ShoppingCartBatchSerializer)
+from api.conditional import ConditionalGetMixin
 from api.pagination import FoodPagination
+from core.constants import AUTOCOMPLETE_LIMIT, FEED_MAX_LIMIT, PAGE_SIZE
+from users.models import Subscription
 from users.permissions import IsAdminOrAuthorOrReadOnly
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class CatalogueMixin:
+    """Отдает справочник из кэша каталога с ETag и Cache-Control"""
+
+    catalogue_name = None
+
+    def filter_catalogue(self, items):
+        return items
+
+    def catalogue_response(self, request, get_data):
+        data = catalogue.refresh()
+        etag = quote_etag(catalogue.get_etag(request, data))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(get_data(data))
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, must_revalidate=True,
+                            max_age=settings.CATALOGUE_MAX_AGE)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            request,
+            lambda data: self.filter_catalogue(data[self.catalogue_name]),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        def get_item(data):
+            try:
+                return data[f'{self.catalogue_name}_by_id'][
+                    int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+                ]
+            except (KeyError, ValueError):
+                raise Http404
+
+        return self.catalogue_response(request, get_item)
+
+
+class IngredientViewSet(CatalogueMixin, ReadOnlyModelViewSet):
     """Вьюсет ингредиента"""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    catalogue_name = 'ingredients'
 
+    def filter_catalogue(self, items):
+        name = self.request.query_params.get('name')
+        if not name:
+            return items
+        return ingredient_index.starting_with(name)
 
-class TagViewSet(ReadOnlyModelViewSet):
+    @action(detail=False)
+    def autocomplete(self, request):
+        try:
+            limit = int(request.query_params.get('limit',
+                                                 AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''),
+            max(1, min(limit, AUTOCOMPLETE_LIMIT)),
+        ))
+
+
+class TagViewSet(CatalogueMixin, ReadOnlyModelViewSet):
     """Вьюсет тега"""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
+    catalogue_name = 'tags'
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ModelViewSet):
     """Вьюсет рецепта"""
 
     queryset = Recipe.objects.all()
@@ -53,17 +132,127 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = FoodPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    personal_filters = ('is_favorited', 'is_in_shopping_cart')
+    shared_page = False
+    updated_fields = ('updated_at', 'author__updated_at')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            user = None if self.shared_page else self.request.user
+            return queryset.select_related('snapshot').with_user_flags(user)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
-            return RecipeReadSerializer
+            return RecipeSnapshotSerializer
         return RecipeWriteSerializer
 
+    def cached_response(self, request, view, *args, **kwargs):
+        user = request.user
+        if not user.is_anonymous and any(
+            name in request.query_params for name in self.personal_filters
+        ):
+            return view(request, *args, **kwargs)
+        data = get_cached_page(request)
+        if data is None:
+            self.shared_page = True
+            data = view(request, *args, **kwargs).data
+            set_cached_page(request, data)
+        if not user.is_anonymous:
+            if isinstance(data, dict):
+                apply_user_overlay(user, data.get('results', [data]))
+            else:
+                apply_user_overlay(user, data)
+        return Response(data)
+
+    def get_etag_queryset(self):
+        return Recipe.objects.all()
+
+    def get_overlay_querysets(self, user):
+        return (
+            Favorite.objects.filter(user=user),
+            ShoppingCart.objects.filter(user=user),
+            Subscription.objects.filter(user=user),
+        )
+
+    def get_etag_extra(self):
+        return (get_catalogue_version(),)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.cached_response,
+                                         super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.cached_response,
+                                         super().retrieve, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        update_snapshots([serializer.instance.pk])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        update_snapshots([serializer.instance.pk])
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
         return context
 
+    @action(detail=False)
+    def cook(self, request):
+        serializer = CookQuerySerializer(data={'ingredients': [
+            value
+            for values in request.query_params.getlist('ingredients')
+            for value in values.split(',') if value
+        ]})
+        serializer.is_valid(raise_exception=True)
+        ranked = recipe_index.search(
+            serializer.validated_data['ingredients']
+        )
+        page = self.paginate_queryset(ranked)
+        matches = page if page is not None else ranked
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in matches]
+        )
+        matches = [(recipes[recipe_id], matched)
+                   for recipe_id, matched in matches if recipe_id in recipes]
+        data = self.get_serializer(
+            [recipe for recipe, _ in matches], many=True
+        ).data
+        for item, (_, matched) in zip(data, matches):
+            item['matched_ingredients'] = matched
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        try:
+            limit = int(request.query_params.get('limit', PAGE_SIZE))
+        except ValueError:
+            limit = PAGE_SIZE
+        limit = max(1, min(limit, FEED_MAX_LIMIT))
+        try:
+            before = int(request.query_params['before'])
+        except (KeyError, ValueError):
+            before = None
+        recipe_ids = get_feed_ids(request.user, before, limit + 1)
+        next_url = None
+        if len(recipe_ids) > limit:
+            recipe_ids = recipe_ids[:limit]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', recipe_ids[-1]
+            )
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True
+        )
+        return Response({'next': next_url, 'results': serializer.data})
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -106,36 +295,53 @@ class RecipeViewSet(ModelViewSet):
         return Response(serializer.delete(data),
                         status=HTTP_204_NO_CONTENT)
 
+    def batch_response(self, request, serializer_class):
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if request.method == 'POST':
+            return Response(serializer.add(request.user))
+        return Response(serializer.remove(request.user))
+
     @action(
         detail=False,
-        permission_classes=[IsAuthenticated]
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite/batch',
+    )
+    def favorite_batch(self, request):
+        return self.batch_response(request, FavoriteBatchSerializer)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart/batch',
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch_response(request, ShoppingCartBatchSerializer)
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopping_cart.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=models.Sum('amount'))
-
-        today = datetime.today()
-        shopping_list = (
-            f'Дата: {today:%Y-%m-%d}\n\n'
-            f'{user.get_full_name()} должен купить:\n\n'
+        export_format = request.accepted_renderer.format
+        etag = quote_etag(get_shopping_list_etag(user, export_format))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        filename = f'{user.username}_shopping_list.{export_format}'
+        response = StreamingHttpResponse(
+            stream_shopping_list(user, export_format),
+            content_type=(f'{request.accepted_renderer.media_type}; '
+                          'charset=utf-8'),
         )
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ])
-        shopping_list += f'\n\nпроект Foodgram ({today:%Y})'
-
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
         response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['ETag'] = etag
         return response
@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth.models import Group
 
@@ -19,22 +18,14 @@ class UserAdmin(DjangoUserAdmin):
     list_filter = ('email', 'username')
 
     def get_recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_follower_count(self, obj):
-        return obj.follower.count()
+        return obj.followers_count
 
     get_recipe_count.short_description = 'Кол-во рецептов'
     get_follower_count.short_description = 'Кол-во подписчиков'
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(recipe_count=Count('recipes',
-                                                        distinct=True),
-                                     follower_count=Count('follower',
-                                                          distinct=True))
-        return queryset
-
 
 @admin.register(Subscription)
 class SubscribeAdmin(admin.ModelAdmin):
@@ -6,6 +6,7 @@ from core.constants import (MAX_LENGTH_NAME,
                             MAX_LENGTH_EMAIL,
                             MAX_LENGTH_PASSWORD,
                             ERR_SUB_YOUSELF)
+from core.managers import InsertIgnoreQuerySet
 
 
 class User(AbstractUser):
@@ -39,6 +40,18 @@ class User(AbstractUser):
         max_length=MAX_LENGTH_PASSWORD,
         blank=False,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -65,6 +78,8 @@ class Subscription(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = InsertIgnoreQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -78,6 +93,10 @@ class Subscription(models.Model):
                 name='prevent_self_follow'
             ),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscription_author_user_idx'),
+        ]
 
     def full_clean(self, *args, **kwargs):
         super().full_clean(*args, **kwargs)
@@ -1,12 +1,27 @@
+from django.db import transaction
 from djoser.serializers import (UserCreateSerializer,
                                 UserSerializer,
                                 ValidationError)
-from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.exceptions import NotFound
+from rest_framework.fields import (IntegerField,
+                                   ListField,
+                                   SerializerMethodField)
+from rest_framework.serializers import ModelSerializer, Serializer
 
 from .models import User, Subscription
+from recipes import feed
+from recipes.counters import shift_counter
 from recipes.recipeshort_serializers import RecipeShortSerializer
-from core.constants import ERR_SUB_YOUSELF, ERR_ALREADY_SUB
+from core.constants import (ERR_SUB_YOUSELF,
+                            ERR_ALREADY_SUB,
+                            ERR_NOT_SUB,
+                            BATCH_MAX_SIZE,
+                            BATCH_ADDED,
+                            BATCH_EXISTS,
+                            BATCH_REMOVED,
+                            BATCH_ABSENT,
+                            BATCH_NOT_FOUND,
+                            BATCH_ERROR)
 
 
 class FoodUserCreateSerializer(UserCreateSerializer):
@@ -27,7 +42,19 @@ class FoodUserSerializer(UserSerializer):
         fields = ('email', 'id', 'username',
                   'first_name', 'last_name', 'is_subscribed', )
 
+    def to_representation(self, instance):
+        return {
+            'email': instance.email,
+            'id': instance.id,
+            'username': instance.username,
+            'first_name': instance.first_name,
+            'last_name': instance.last_name,
+            'is_subscribed': self.get_is_subscribed(instance),
+        }
+
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return (user and not user.is_anonymous
                 and obj.following.filter(
@@ -45,7 +72,17 @@ class SubscribeSerializer(FoodUserSerializer):
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count', )
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['recipes'] = self.get_recipes(instance)
+        data['recipes_count'] = self.get_recipes_count(instance)
+        return data
+
     def get_recipes(self, obj):
+        latest_recipes = self.context.get('latest_recipes')
+        if latest_recipes is not None:
+            return RecipeShortSerializer(latest_recipes.get(obj.id, []),
+                                         many=True).data
         limit = self.context['request'].query_params.get('recipes_limit')
         try:
             return RecipeShortSerializer(obj.recipes.all()[:int(limit)],
@@ -54,7 +91,10 @@ class SubscribeSerializer(FoodUserSerializer):
             return None
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        recipes_counts = self.context.get('recipes_counts')
+        if recipes_counts is not None:
+            return recipes_counts.get(obj.id, obj.recipes_count)
+        return obj.recipes_count
 
 
 class SubscribeAddSerializer(ModelSerializer):
@@ -64,17 +104,84 @@ class SubscribeAddSerializer(ModelSerializer):
         model = Subscription
         fields = ('user', 'author')
 
+    def validate(self, data):
+        if data['user'] == data['author']:
+            raise ValidationError(ERR_SUB_YOUSELF)
+        return data
+
+    @transaction.atomic
     def create(self, data):
         user = data['user']
         author = data['author']
-        Subscription.objects.create(user=user, author=author)
+        if not Subscription.objects.insert_ignore(user=user, author=author):
+            raise ValidationError(ERR_ALREADY_SUB)
+        shift_counter(User, 'followers_count', [author.pk], 1)
+        feed.backfill(user, [author.pk])
         return True
 
-    def validate_sub(self, obj):
-        user = obj.get('user')
-        author = obj.get('author')
-        if user.following.filter(author=author).exists():
-            raise ValidationError(ERR_ALREADY_SUB)
-        if user == author:
-            raise ValidationError(ERR_SUB_YOUSELF)
-        return obj
+    @transaction.atomic
+    def delete(self, data):
+        user = data['user']
+        author = data['author']
+        deleted, _ = Subscription.objects.filter(user=user,
+                                                 author=author).delete()
+        if not deleted:
+            raise NotFound(ERR_NOT_SUB)
+        feed.remove(user, [author])
+        return deleted
+
+
+class SubscribeBatchSerializer(Serializer):
+    """Сериализатор пакетной подписки и отписки"""
+
+    ids = ListField(child=IntegerField(), allow_empty=False,
+                    max_length=BATCH_MAX_SIZE)
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+    def add(self, user):
+        """Подписывает одним INSERT без конфликтов.
+
+        Добавленными считаются только строки, вернувшиеся из INSERT,
+        поэтому параллельные запросы не увеличивают счетчики дважды.
+        """
+        ids = self.validated_data['ids']
+        found = set(User.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        with transaction.atomic():
+            added = Subscription.objects.insert_ignore_many(
+                [{'user': user, 'author_id': pk}
+                 for pk in ids if pk in found and pk != user.pk],
+                'author_id',
+            )
+            shift_counter(User, 'followers_count', added, 1)
+            feed.backfill(user, added)
+        result = []
+        for pk in ids:
+            if pk not in found:
+                result.append({'id': pk, 'status': BATCH_NOT_FOUND})
+            elif pk == user.pk:
+                result.append({'id': pk, 'status': BATCH_ERROR,
+                               'detail': ERR_SUB_YOUSELF})
+            else:
+                result.append({'id': pk, 'status': (
+                    BATCH_ADDED if pk in added else BATCH_EXISTS
+                )})
+        return result
+
+    @transaction.atomic
+    def remove(self, user):
+        """Отписывает одним DELETE, учитывая вернувшиеся строки"""
+        ids = self.validated_data['ids']
+        removed = Subscription.objects.filter(
+            user=user, author_id__in=ids
+        ).delete_returning('author_id')
+        shift_counter(User, 'followers_count', removed, -1)
+        feed.remove(user, removed)
+        return [
+            {'id': pk,
+             'status': BATCH_REMOVED if pk in removed else BATCH_ABSENT}
+            for pk in ids
+        ]
@@ -0,0 +1,53 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import User
+
+
+class UserConditionalGetTest(TestCase):
+    """Ответы 304 на If-None-Match для пользователей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def assert_modified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changed_after_write(self):
+        urls = ('/api/users/?limit=10', f'/api/users/{self.author.pk}/')
+        etags = [self.get_etag(url) for url in urls]
+        self.author.first_name = 'Шеф'
+        self.author.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                self.assert_modified(url, etag)
+
+    def test_changed_after_subscription(self):
+        url = f'/api/users/{self.author.pk}/'
+        etag = self.get_etag(url)
+        response = self.client.post(f'{url}subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assert_modified(url, etag)
+        self.assertTrue(self.client.get(url).data['is_subscribed'])
@@ -1,4 +1,5 @@
 from django.contrib.auth.hashers import make_password
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -6,25 +7,39 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_401_UNAUTHORIZED)
-from users.models import User, Subscription
+from recipes.models import Recipe
+from users.models import Subscription, User
 
 from core.constants import (ERR_NOT_FOUND,
                             SUCCESS_SUB,
                             SUCCESS_UNSUB)
+from api.conditional import ConditionalGetMixin
 from api.pagination import FoodPagination
 from .serializers import (FoodUserSerializer,
                           FoodUserCreateSerializer,
                           SubscribeSerializer,
-                          SubscribeAddSerializer)
+                          SubscribeAddSerializer,
+                          SubscribeBatchSerializer)
 
 
-class FoodUserViewSet(UserViewSet):
+class FoodUserViewSet(ConditionalGetMixin, UserViewSet):
     """Вьюсет пользователя"""
 
     queryset = User.objects.all()
     serializer_class = FoodUserSerializer
     pagination_class = FoodPagination
 
+    def get_overlay_querysets(self, user):
+        return (Subscription.objects.filter(user=user),)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list,
+                                         *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve,
+                                         *args, **kwargs)
+
     @action(detail=False, methods=['post'],
             permission_classes=[IsAuthenticated])
     def set_password(self, request, pk=None):
@@ -44,11 +59,22 @@ class FoodUserViewSet(UserViewSet):
 
     @action(detail=False, permission_classes=[IsAuthenticated],)
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(is_subscribed=Value(True, output_field=BooleanField()))
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(
-            pages, many=True, context={'request': request}
-        )
+        context = {'request': request}
+        try:
+            limit = int(request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            limit = None
+        if limit is not None and pages is not None:
+            context['latest_recipes'], context['recipes_counts'] = (
+                Recipe.objects.latest_by_authors(
+                    [author.id for author in pages], limit
+                )
+            )
+        serializer = SubscribeSerializer(pages, many=True, context=context)
         return self.get_paginated_response(serializer.data)
 
     @action(methods=['post', 'delete'], detail=True,
@@ -69,12 +95,20 @@ class FoodUserViewSet(UserViewSet):
                 {'message': SUCCESS_SUB, 'data': response_data},
                 status=status.HTTP_201_CREATED,
             )
-        subscribe = get_object_or_404(Subscription,
-                                      user=user, author=author)
-        subscribe.delete()
+        SubscribeAddSerializer().delete({'user': user, 'author': author})
         return Response({'message': SUCCESS_UNSUB},
                         status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['post', 'delete'], detail=False,
+            permission_classes=[IsAuthenticated],
+            url_path='subscribe/batch')
+    def subscribe_batch(self, request):
+        serializer = SubscribeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if request.method == 'POST':
+            return Response(serializer.add(request.user))
+        return Response(serializer.remove(request.user))
+
     def get_serializer_context(self):
         return {'request': self.request}
 